@@ -0,0 +1,55 @@
+# Scaling benchmark for graph_builder.build_graph.
+#   python benchmarks/bench_build_graph.py [max_entities]
+# Prints cold (empty fragment cache), warm (nothing changed) and one-edit
+# build times; a flat µs/entity column means linear scaling. The last column
+# is a cold 2-hop ego view of one entity, which should stay flat as n grows.
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from graph_builder import FragmentCache, build_graph
+from structure_store import EntityStore, RelationshipStore
+
+TYPES = ["Individual", "Company", "Trust", "SMSF", "Other"]
+
+
+def make_structure(n: int, seed: int = 1):
+    rnd = random.Random(seed)
+    store = EntityStore([
+        dict(id=f"e{i}", name=f"Entity {i}", type=rnd.choice(TYPES), ABN=str(rnd.randrange(10**10, 10**11)))
+        for i in range(n)
+    ])
+    rels = RelationshipStore([
+        dict(source_id=f"e{rnd.randrange(n)}", target_id=f"e{rnd.randrange(n)}", label="owns")
+        for _ in range(n)
+    ])
+    return store, rels
+
+
+def timed(fn) -> float:
+    t0 = time.perf_counter()
+    fn()
+    return time.perf_counter() - t0
+
+
+def main(max_n: int):
+    sizes = [n for n in (1_000, 5_000, 10_000, 25_000, 50_000, 100_000) if n <= max_n]
+    print(f"{'entities':>9} {'cold s':>8} {'warm s':>8} {'1 edit s':>9} {'cold µs/ent':>12} {'warm µs/ent':>12} {'2-hop ms':>9}")
+    for n in sizes:
+        store, rels = make_structure(n)
+        cache = FragmentCache()
+        build = lambda: build_graph(store, rels, "Bench", "LR", cache=cache).source
+        cold = timed(build)
+        warm = timed(build)
+        store.update(f"e{n // 2}", {"name": "Edited"})
+        edit = timed(build)
+        ego = timed(lambda: build_graph(store, rels, "Bench", "LR", cache=FragmentCache(), focus=(["e1"], 2)).source)
+        print(f"{n:>9} {cold:>8.3f} {warm:>8.3f} {edit:>9.3f} {cold / n * 1e6:>12.1f} {warm / n * 1e6:>12.1f}"
+              f" {ego * 1000:>9.2f}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
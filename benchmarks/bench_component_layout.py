@@ -0,0 +1,62 @@
+# Monolithic vs per-component layout (component_layout.render_by_component).
+#   python benchmarks/bench_component_layout.py [groups] [entities per group] [format]
+# Builds `groups` unrelated client groups, then times one layout of the whole
+# graph against laying each component out separately on the warm worker pool
+# (or `dot` subprocesses) and packing the results. Needs Graphviz and gvpack.
+import os
+import random
+import shutil
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from component_layout import render_by_component
+from graph_builder import FragmentCache, build_graph, component_graphs
+from gv_pool import GraphvizWorkerPool
+from renderers import AutoRenderer, LocalRenderer, WarmRenderer
+from structure_store import EntityStore, RelationshipStore
+
+TYPES = ["Individual", "Company", "Trust", "SMSF", "Other"]
+
+
+def make_groups(groups: int, size: int, seed: int = 1):
+    # each group is a random tree plus a few cross links, with no edges between groups
+    rnd = random.Random(seed)
+    ents, rels = [], []
+    for g in range(groups):
+        ids = [f"g{g}e{i}" for i in range(size)]
+        ents += [dict(id=eid, name=f"Group {g} entity {i}", type=rnd.choice(TYPES)) for i, eid in enumerate(ids)]
+        rels += [dict(source_id=ids[rnd.randrange(i)], target_id=ids[i], label="owns") for i in range(1, size)]
+        rels += [dict(source_id=rnd.choice(ids), target_id=rnd.choice(ids), label="director") for _ in range(size // 10)]
+    return EntityStore(ents), RelationshipStore(rels)
+
+
+def main(groups: int, size: int, fmt: str):
+    workers = int(os.environ.get("GRAPHVIZ_WORKERS", 4))
+    pool = GraphvizWorkerPool(size=workers).start()
+    renderer = AutoRenderer([WarmRenderer(pool), LocalRenderer()])
+    if not renderer.available():
+        print("Graphviz not available (needs libgvc or the dot binary)")
+        return
+    if not shutil.which("gvpack"):
+        print("gvpack not found: per-component layout falls back to the monolithic render")
+    store, rels = make_groups(groups, size)
+    cache = FragmentCache()
+    whole = build_graph(store, rels, "Bench", "LR", cache=cache).source
+    parts = [g.source for g in component_graphs(store, rels, "Bench", "LR", cache=cache)]
+    print(f"{groups} groups x {size} entities, {len(parts)} component graphs, {fmt}, {workers} workers")
+
+    t0 = time.perf_counter()
+    renderer.render(whole, fmt)
+    mono = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    render_by_component(parts, fmt, renderer.render, whole, workers=workers)
+    split = time.perf_counter() - t0
+    print(f"monolithic {mono:8.2f}s   per component {split:8.2f}s   speed-up {mono / split:5.1f}x")
+    pool.close()
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    main(int(args[0]) if args else 20, int(args[1]) if len(args) > 1 else 100, args[2] if len(args) > 2 else "svg")
@@ -0,0 +1,49 @@
+# Layout time per graph_builder.LAYOUTS profile as the graph grows.
+#   python benchmarks/bench_layouts.py [max_entities] [timeout seconds]
+# Renders the same structure to SVG with each profile forced, then prints
+# what the automatic choice would pick for a 10 s budget from the measured
+# timings. A profile that overruns the timeout is skipped for larger sizes.
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from bench_build_graph import make_structure
+from graph_builder import LAYOUTS, LayoutTimings, build_graph, choose_layout
+from renderers import LocalRenderer, RenderError
+
+
+def main(max_n: int, timeout: float):
+    renderer = LocalRenderer(timeout=timeout)
+    if not renderer.available():
+        print("Graphviz 'dot' executable not found")
+        return
+    timings = LayoutTimings()
+    slow = set()
+    sizes = [n for n in (50, 100, 250, 500, 1_000, 2_500, 5_000) if n <= max_n]
+    print(f"{'entities':>9} " + " ".join(f"{p:>13}" for p in LAYOUTS) + "   auto (10 s)")
+    for n in sizes:
+        store, rels = make_structure(n)
+        row = []
+        for profile in LAYOUTS:
+            if profile in slow:
+                row.append(f"{'-':>13}")
+                continue
+            src = build_graph(store, rels, "Bench", "LR", layout=(profile, None, None)).source
+            t0 = time.perf_counter()
+            try:
+                renderer.render(src, "svg")
+            except RenderError:
+                slow.add(profile)
+                row.append(f"{'timeout':>13}")
+                continue
+            seconds = time.perf_counter() - t0
+            timings.record_source(src, seconds)
+            row.append(f"{seconds:>12.2f}s")
+        print(f"{n:>9} " + " ".join(row) + f"   {choose_layout(2 * n, 'auto', 10.0, timings)}")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    main(int(args[0]) if args else 5_000, float(args[1]) if len(args) > 1 else 60.0)
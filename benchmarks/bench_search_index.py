@@ -0,0 +1,62 @@
+# Lookup latency of search_index.SearchIndex.
+#   python benchmarks/bench_search_index.py [entities]
+# Builds the index over a synthetic structure (people and companies with
+# ABN / ACN / TFN), then times typical picker queries including typos,
+# multi-word and identifier lookups, and incremental syncs after edits and
+# after adding a custom field.
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from search_index import SearchIndex
+from structure_store import EntityStore
+
+FIRST = ["James", "Mary", "John", "Patricia", "Robert", "Jennifer", "Michael", "Linda", "William", "Elizabeth"]
+LAST = ["Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis", "Wilson", "Taylor"]
+WORDS = ["Holdings", "Pty", "Ltd", "Investments", "Family", "Trust", "Super", "Fund", "Capital", "Nominees"]
+
+
+def make_store(n: int, seed: int = 1) -> EntityStore:
+    rnd = random.Random(seed)
+    def name(i):
+        if rnd.random() < 0.5:
+            return f"{rnd.choice(FIRST)} {rnd.choice(LAST)}"
+        return f"{rnd.choice(LAST)} {rnd.choice(WORDS)} {rnd.choice(WORDS)} {i}"
+    return EntityStore([
+        dict(id=f"e{i}", name=name(i), type="Company", ABN=str(rnd.randrange(10**10, 10**11)),
+             ACN=str(rnd.randrange(10**8, 10**9)), TFN=str(rnd.randrange(10**8, 10**9)))
+        for i in range(n)
+    ])
+
+
+def main(n: int, repeat: int = 50):
+    store = make_store(n)
+    index = SearchIndex()
+    t0 = time.perf_counter()
+    index.sync(store)
+    print(f"{n} entities, index built in {time.perf_counter() - t0:.2f}s")
+    abn = store.get("e7")["ABN"]
+    queries = ["j", "smith", "smtih", "jon smith", "garcia holdings", "holdings 7",
+               abn[:5], f"{abn[:2]} {abn[2:5]} {abn[5:8]} {abn[8:]}", "williams family trust 4"]
+    for q in queries:
+        t0 = time.perf_counter()
+        for _ in range(repeat):
+            hits = index.search(q)
+        ms = (time.perf_counter() - t0) / repeat * 1000
+        print(f"{q!r:28} {ms:7.2f} ms  {len(hits):>3} hits  {store.name_by_id(hits[0]) if hits else ''}")
+    store.update("e5", {"name": "Edited Name"})
+    store.remove("e6")
+    t0 = time.perf_counter()
+    index.sync(store)
+    print(f"sync after 1 edit + 1 delete: {(time.perf_counter() - t0) * 1000:.1f} ms")
+    store.add_field("Notes")
+    t0 = time.perf_counter()
+    index.sync(store)
+    print(f"sync after adding a custom field: {(time.perf_counter() - t0) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
@@ -0,0 +1,50 @@
+# Throughput of the warm Graphviz worker pool versus spawning `dot` per render.
+#   python benchmarks/bench_worker_pool.py [renders] [workers] [entities]
+# Both sides render the same small structures to SVG with `workers` threads;
+# needs Graphviz (the `dot` binary and libgvc) installed.
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from bench_build_graph import make_structure
+from graph_builder import build_graph
+from gv_pool import GraphvizWorkerPool
+from renderers import LocalRenderer, WarmRenderer
+
+
+def throughput(backend, sources, workers: int) -> float:
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        for data in ex.map(lambda src: backend.render(src, "svg"), sources):
+            assert data
+    return len(sources) / (time.perf_counter() - t0)
+
+
+def main(renders: int, workers: int, entities: int):
+    sources = []
+    for seed in range(renders):
+        store, rels = make_structure(entities, seed=seed)
+        sources.append(build_graph(store, rels, f"Bench {seed}", "LR").source)
+
+    local = LocalRenderer()
+    pool = GraphvizWorkerPool(size=workers).start()
+    if not local.available() or not pool.available():
+        sys.exit("Graphviz (dot binary and libgvc) is required for this benchmark")
+    warm = WarmRenderer(pool)
+    warm.render(sources[0], "svg")  # first-render font/plugin setup is not measured
+
+    print(f"{renders} renders, {workers} workers, {entities} entities each")
+    spawn = throughput(local, sources, workers)
+    pooled = throughput(warm, sources, workers)
+    print(f"{'spawn per render':>18} {spawn:>8.1f} renders/s")
+    print(f"{'warm pool':>18} {pooled:>8.1f} renders/s  ({pooled / spawn:.1f}x)")
+    print(f"pool stats: {pool.stats}")
+    pool.close()
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:]]
+    main(*(args + [200, 4, 30][len(args):]))
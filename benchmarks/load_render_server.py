@@ -0,0 +1,54 @@
+# Load test for render_server.py.
+#   python render_server.py --port 8000 &
+#   python benchmarks/load_render_server.py [url] [requests] [concurrency] [distinct graphs]
+# Sends POST /render from `concurrency` threads through RemoteRenderClient
+# (retries off, so 503 backpressure is visible) and reports throughput,
+# latency percentiles and status counts. Fewer distinct graphs than requests
+# exercises the server's result cache.
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from bench_build_graph import make_structure
+from graph_builder import build_graph
+from renderers import RemoteRenderClient, RenderError
+
+
+def main(url: str, total: int, concurrency: int, distinct: int):
+    sources = []
+    for seed in range(distinct):
+        store, rels = make_structure(40, seed=seed)
+        sources.append(build_graph(store, rels, f"Load {seed}", "LR").source)
+    client = RemoteRenderClient(url, retries=0, pool_size=concurrency)
+
+    def one(i: int):
+        t0 = time.perf_counter()
+        try:
+            client.render(sources[i % distinct], "svg")
+            status = "200"
+        except RenderError as e:
+            status = str(e).split(" - ")[0].rsplit(" ", 1)[-1]
+        return status, time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as ex:
+        results = list(ex.map(one, range(total)))
+    wall = time.perf_counter() - t0
+
+    ok = sorted(s for status, s in results if status == "200")
+    print(f"{total} requests, {concurrency} concurrent, {distinct} distinct graphs: {total / wall:.1f} req/s")
+    print("status:", dict(Counter(status for status, _ in results)))
+    if ok:
+        pct = lambda p: ok[min(len(ok) - 1, int(p / 100 * len(ok)))] * 1000
+        print(f"latency ms  p50 {pct(50):.0f}  p90 {pct(90):.0f}  p99 {pct(99):.0f}  max {ok[-1] * 1000:.0f}")
+    client.close()
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    main(args[0] if args else "http://127.0.0.1:8000",
+         *[int(a) for a in args[1:]] + [500, 16, 50][len(args[1:]):])
@@ -0,0 +1,57 @@
+import shutil
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+from renderers import RenderError
+
+# --------------------------
+# Per-component Layout
+# --------------------------
+# Graphviz layout is superlinear in graph size, so unrelated groups are laid
+# out as separate graphs (graph_builder.component_graphs), several at a time;
+# each render already runs in its own Graphviz process (a warm worker or a
+# `dot` subprocess). Each component is laid out to positioned DOT, gvpack
+# tiles them into one graph and the nop2 engine draws that in the requested
+# format without laying it out again, so PDF stays vector at full size.
+# Without gvpack, or with a backend that only returns finished images (the
+# remote /render service), the whole graph is rendered in one go instead.
+
+
+def with_graph_attrs(dot_source: str, **attrs) -> str:
+    # graph attributes appended before the closing brace, so they override any
+    # set earlier in the body (laid-out DOT repeats the original `layout`)
+    body, brace, tail = dot_source.rpartition("}")
+    return body + "".join(f'\t{k}="{v}"\n' for k, v in attrs.items()) + brace + tail
+
+
+def render_each(sources, fmt: str, render, workers: int = 4) -> list:
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(sources)))) as ex:
+        return list(ex.map(lambda src: render(src, fmt), sources))
+
+
+def pack_layouts(positioned, gvpack: str, timeout: float = 60.0) -> str:
+    # one graph from the laid-out components, tiled in rows
+    try:
+        proc = subprocess.run([gvpack, "-array_t", "-m36"], input=b"\n".join(positioned),
+                              capture_output=True, timeout=timeout)
+    except (subprocess.TimeoutExpired, OSError) as e:
+        raise RenderError(f"gvpack failed: {e}") from e
+    if proc.returncode != 0:
+        raise RenderError(f"gvpack failed: {proc.stderr.decode('utf-8', 'replace')[:200]}")
+    return proc.stdout.decode("utf-8")
+
+
+def render_by_component(sources, fmt: str, render, dot_source: str, workers: int = 4,
+                        gvpack: str = None) -> bytes:
+    # `sources` are the component graphs of `dot_source`; render(dot, fmt) -> bytes.
+    # fmt "dot" returns the packed, laid-out DOT itself
+    gvpack = gvpack or shutil.which("gvpack")
+    if len(sources) < 2 or not gvpack:
+        return render(dot_source, fmt)
+    try:
+        packed = pack_layouts(render_each(sources, "dot", render, workers), gvpack)
+        if fmt == "dot":
+            return packed.encode("utf-8")
+        return render(with_graph_attrs(packed, layout="nop2"), fmt)
+    except RenderError:
+        return render(dot_source, fmt)
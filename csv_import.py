@@ -0,0 +1,108 @@
+import hashlib
+import uuid
+
+import pandas as pd
+
+# --------------------------
+# CSV Import Helpers
+# --------------------------
+REL_COLUMNS = ["source_id", "target_id", "label"]
+ISSUE_COLUMNS = ["row", "column", "value", "problem"]
+CHUNK_ROWS = 50_000
+
+
+def file_digest(data) -> str:
+    # accepts bytes or a buffer (e.g. BytesIO.getbuffer()) so large uploads aren't copied
+    return hashlib.sha256(data).hexdigest()
+
+
+def read_chunks(upload, chunk_rows: int = CHUNK_ROWS):
+    # stream a CSV as text-only DataFrame chunks; chunk indexes continue across chunks
+    return pd.read_csv(upload, dtype=str, keep_default_na=False, chunksize=chunk_rows)
+
+
+def _issues(rows, column, values, problem) -> pd.DataFrame:
+    return pd.DataFrame({"row": rows, "column": column, "value": values, "problem": problem},
+                        columns=ISSUE_COLUMNS)
+
+
+def concat_issues(issues) -> pd.DataFrame:
+    issues = [i for i in issues if len(i)]
+    if not issues:
+        return pd.DataFrame(columns=ISSUE_COLUMNS)
+    return pd.concat(issues, ignore_index=True).sort_values(["row", "column"], ignore_index=True)
+
+
+# Checks one chunk of an entities CSV. Rows without a name, and rows repeating
+# an id seen earlier in the chunk or already in `existing`, are dropped;
+# unknown types become "Other". All of these are reported as issues.
+def validate_entities(chunk: pd.DataFrame, entity_types, existing=()):
+    if "name" not in chunk.columns:
+        raise ValueError("Entities CSV needs a 'name' column.")
+    df = chunk.fillna("").astype(str)
+    rows = df.index + 2  # 1-based, after the header line
+    issues = []
+    blank = df["name"].str.strip() == ""
+    issues.append(_issues(rows[blank], "name", "", "missing"))
+    if "type" in df.columns:
+        unknown = ~df["type"].isin(entity_types) & ~blank
+        issues.append(_issues(rows[unknown], "type", df.loc[unknown, "type"], "unknown type, set to Other"))
+        df.loc[unknown, "type"] = "Other"
+    else:
+        df["type"] = "Other"
+    dup = pd.Series(False, index=df.index)
+    if "id" in df.columns:
+        ids = df["id"].str.strip()
+        dup = (ids != "") & ~blank & (ids.isin(existing) | ids[~blank].duplicated().reindex(df.index, fill_value=False))
+        issues.append(_issues(rows[dup], "id", df.loc[dup, "id"], "duplicate id, row skipped"))
+    return df[~blank & ~dup], concat_issues(issues)
+
+
+# Ids for an entities CSV without an id column. The first row with a name gets
+# uuid5(name), so appending the same people again adds nothing; later rows
+# repeating the name get uuid5("name#2"), "#3", ... so namesakes stay apart.
+# `seen` (name -> rows so far) carries the count across chunks.
+def name_ids(names, seen: dict) -> list:
+    ids = []
+    for name in names:
+        seen[name] = seen.get(name, 0) + 1
+        ids.append(str(uuid.uuid5(uuid.NAMESPACE_DNS, name if seen[name] == 1 else f"{name}#{seen[name]}")))
+    return ids
+
+
+# Resolves from/to names to entity ids with a hash join on the entity table.
+# Returns (relationships, issues): the rows whose both ends resolved to exactly
+# one entity, and one issue row per unresolved, ambiguous or unknown reference.
+def resolve_relationships(df_rel: pd.DataFrame, entities: pd.DataFrame):
+    for name_col, id_col in (("from", "source_id"), ("to", "target_id")):
+        if id_col not in df_rel.columns and name_col not in df_rel.columns:
+            raise ValueError(f"Relationships CSV needs a '{id_col}' or '{name_col}' column.")
+    df = df_rel.fillna("").astype(str)
+    df["row"] = df.index + 2  # 1-based, after the header line
+    df = df.reset_index(drop=True)
+    if "label" not in df.columns:
+        df["label"] = ""
+
+    names = entities[["id", "name"]]
+    counts = names["name"].value_counts()
+    unique = names[names["name"].map(counts) == 1].rename(columns={"name": "_name", "id": "_id"})
+
+    issues = []
+    for name_col, id_col in (("from", "source_id"), ("to", "target_id")):
+        if id_col in df.columns:
+            known = df[id_col].isin(entities["id"])
+            bad = df[~known]
+            issues.append(_issues(bad["row"], id_col, bad[id_col], "unknown id"))
+            df.loc[~known, id_col] = ""
+            continue
+        df = df.merge(unique, how="left", left_on=name_col, right_on="_name").drop(columns="_name")
+        df[id_col] = df.pop("_id").fillna("")
+        missing = df[df[id_col] == ""]
+        matches = missing[name_col].map(counts).fillna(0).astype(int)
+        issues.append(_issues(missing["row"], name_col, missing[name_col], [
+            f"ambiguous ({n} entities share this name)" if n > 1 else "missing" if not v else "unresolved"
+            for n, v in zip(matches, missing[name_col])
+        ]))
+
+    ok = (df["source_id"] != "") & (df["target_id"] != "")
+    return df.loc[ok, REL_COLUMNS].reset_index(drop=True), concat_issues(issues)
@@ -0,0 +1,86 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+# --------------------------
+# Background Export Jobs
+# --------------------------
+# Renders run on a bounded, process-wide thread pool so the script thread
+# never waits on them. Each job is one (DOT, format) render; the session
+# keeps its ExportJob objects and polls them on later reruns.
+
+EXPORT_FORMATS = {
+    "png": dict(mime="image/png", file_name="structure.png"),
+    "pdf": dict(mime="application/pdf", file_name="structure.pdf"),
+    "svg": dict(mime="image/svg+xml", file_name="structure.svg"),
+}
+
+
+class ExportQueueFull(Exception):
+    pass
+
+
+class ExportJob:
+    def __init__(self, fmt: str, future):
+        self.id = str(uuid.uuid4())
+        self.fmt = fmt
+        self.submitted = time.time()
+        self.finished = None
+        self._future = future
+
+    @property
+    def status(self) -> str:
+        if self._future.cancelled():
+            return "cancelled"
+        if self._future.done():
+            return "failed" if self._future.exception() is not None else "done"
+        return "running" if self._future.running() else "queued"
+
+    @property
+    def done(self) -> bool:
+        return self._future.done()
+
+    @property
+    def data(self) -> bytes:
+        return self._future.result() if self.status == "done" else None
+
+    @property
+    def error(self) -> str:
+        if self.status != "failed":
+            return None
+        return str(self._future.exception())
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished or time.time()) - self.submitted
+
+    def cancel(self) -> bool:
+        return self._future.cancel()
+
+
+class ExportManager:
+    def __init__(self, max_workers: int = 4, max_pending: int = 32):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="export")
+        self._pending = threading.BoundedSemaphore(max_pending)
+
+    def submit(self, dot_source: str, formats, render_fn) -> list:
+        # render_fn(dot_source, fmt) -> bytes runs on a worker thread, so it must
+        # not touch st.* APIs; all requested formats are queued at once
+        formats = list(formats)
+        for taken in range(len(formats)):
+            if not self._pending.acquire(blocking=False):
+                for _ in range(taken):
+                    self._pending.release()
+                raise ExportQueueFull("Too many exports in progress, try again shortly.")
+        jobs = []
+        for fmt in formats:
+            fut = self._pool.submit(render_fn, dot_source, fmt)
+            job = ExportJob(fmt, fut)
+            fut.add_done_callback(lambda _f, job=job: self._finish(job))
+            jobs.append(job)
+        return jobs
+
+    def _finish(self, job: ExportJob):
+        job.finished = time.time()
+        self._pending.release()
@@ -1,150 +1,200 @@
 
 import streamlit as st
 import pandas as pd
-from graphviz import Digraph
-import requests
-import uuid
+import os
+import time
+from csv_import import concat_issues, file_digest, name_ids, read_chunks, resolve_relationships, validate_entities
+from graph_builder import (LAYOUTS, TYPE_PLURAL, FragmentCache, LayoutTimings, build_graph, component_graphs,
+                           fold_plan, graph_fingerprint, layout_profile)
+from component_layout import render_by_component
+from incremental_layout import render_with_positions
+from render_cache import DEFAULT_MAX_BYTES, RenderCache
+from export_jobs import EXPORT_FORMATS, ExportManager, ExportQueueFull
+from gv_pool import GraphvizWorkerPool
+from renderers import AutoRenderer, LocalRenderer, RemoteRenderClient, RemoteRenderer, WarmRenderer
+from search_index import SearchIndex
+from structure_store import BASE_FIELDS, EntityStore, RelationshipStore, ensure_id
 
 st.set_page_config(page_title="Family/Group Structure Visualiser", layout="wide")
 
 # --------------------------
 # Session State & Constants
 # --------------------------
-BASE_FIELDS = ["id", "name", "type", "address", "TFN", "ABN", "ACN"]
 ENTITY_TYPES = ["Individual", "Company", "Trust", "SMSF", "Other"]
-TYPE_STYLE = {
-    "Individual": dict(shape="ellipse", fillcolor="#3b82f6", style="filled", fontcolor="white"),
-    "Company":    dict(shape="box",     fillcolor="#10b981", style="filled", fontcolor="white"),
-    "Trust":      dict(shape="box", fillcolor="#1f2937", style="filled", fontcolor="white"),
-    "SMSF":       dict(shape="box", fillcolor="#7c3aed", style="filled", fontcolor="white"),
-    "Other":      dict(shape="triangle",     fillcolor="#9ca3af", style="filled", fontcolor="white"),
-}
 
 def _init_state():
-    if "entities" not in st.session_state: st.session_state.entities = []  # list[dict]
-    if "relationships" not in st.session_state: st.session_state.relationships = []  # list[dict]
-    if "custom_fields" not in st.session_state: st.session_state.custom_fields = []  # list[str]
+    if "entity_store" not in st.session_state: st.session_state.entity_store = EntityStore()
+    if "rel_store" not in st.session_state: st.session_state.rel_store = RelationshipStore()
+    if "search_index" not in st.session_state: st.session_state.search_index = SearchIndex()
+    if "dot_cache" not in st.session_state: st.session_state.dot_cache = FragmentCache()
+    if "graph_memo" not in st.session_state: st.session_state.graph_memo = {}  # last fingerprint + DOT source
+    if "diagram" not in st.session_state:  # server-side layout: last good SVG + the job refreshing it
+        st.session_state.diagram = dict(svg=None, shown=None, seen=None, changed_at=0.0, job=None, job_fp=None,
+                                        failed=None, error=None, svg_job=None,
+                                        positions=None, layout_key=None, job_out=None, last_layout=None)
+    if "export_jobs" not in st.session_state: st.session_state.export_jobs = []  # list[ExportJob], newest first
     if "title" not in st.session_state: st.session_state.title = "Family/Group Structure"
     if "rankdir" not in st.session_state: st.session_state.rankdir = "LR"
+    if "focus_seeds" not in st.session_state: st.session_state.focus_seeds = []  # ego view: entity ids, empty = everything
+    if "focus_hops" not in st.session_state: st.session_state.focus_hops = 2
+    if "node_budget" not in st.session_state: st.session_state.node_budget = 500  # level of detail: max diagram nodes
+    if "lod_expanded" not in st.session_state: st.session_state.lod_expanded = []  # summary keys the user opened
+    if "split_components" not in st.session_state: st.session_state.split_components = True
+    if "layout_override" not in st.session_state: st.session_state.layout_override = "auto"  # or a LAYOUTS profile
+    if "layout_budget" not in st.session_state: st.session_state.layout_budget = 10.0  # seconds, for "auto"
     if "api_url" not in st.session_state: st.session_state.api_url = st.secrets.get("GRAPHVIZ_API_URL", "")
-    if "ent_del_idx" not in st.session_state: st.session_state.ent_del_idx = None
-    if "rel_del_idx" not in st.session_state: st.session_state.rel_del_idx = None
+    if "rel_del_id" not in st.session_state: st.session_state.rel_del_id = None
+    if "imports" not in st.session_state: st.session_state.imports = {}  # (kind, sha256) -> summary
+    if "import_digests" not in st.session_state: st.session_state.import_digests = {}  # upload file_id -> sha256
 
 _init_state()
 
 # --------------------------
 # Helpers
 # --------------------------
-def ensure_id(entity: dict) -> dict:
-    if not entity.get("id"):
-        entity["id"] = str(uuid.uuid4())
-    return entity
-
 def entities_df() -> pd.DataFrame:
-    columns = BASE_FIELDS + [f for f in st.session_state.custom_fields if f not in BASE_FIELDS]
-    rows = []
-    for e in st.session_state.entities:
-        row = {k: e.get(k, "") for k in columns}
-        rows.append(row)
-    if not rows:
-        return pd.DataFrame(columns=columns)
-    return pd.DataFrame(rows)
+    return st.session_state.entity_store.frame()
+
+def diagram_focus():
+    # (seed ids, hops) while the ego view is on, else None for the whole structure
+    seeds = [eid for eid in st.session_state.focus_seeds if eid in st.session_state.entity_store]
+    return (seeds, st.session_state.focus_hops) if seeds else None
+
+def diagram_layout():
+    return (st.session_state.layout_override, st.session_state.layout_budget, get_layout_timings())
+
+def current_dot() -> str:
+    # rebuild only when the graph inputs changed since the last rerun
+    focus = diagram_focus()
+    lod = (st.session_state.node_budget, st.session_state.lod_expanded)
+    split = st.session_state.split_components
+    fp = graph_fingerprint(st.session_state.entity_store, st.session_state.rel_store,
+                           st.session_state.title, st.session_state.rankdir, focus, lod, diagram_layout()) + (split,)
+    memo = st.session_state.graph_memo
+    if memo.get("fingerprint") != fp:
+        # one fold plan for the whole diagram, also used by the per-component
+        # graphs, so "collapsed" describes whichever of the two gets drawn
+        folded = fold_plan(st.session_state.entity_store, st.session_state.rel_store, focus, lod, split)
+        collapsed = {}
+        graph = build_graph(
+            st.session_state.entity_store, st.session_state.rel_store,
+            st.session_state.title, st.session_state.rankdir, cache=st.session_state.dot_cache, focus=focus,
+            lod=lod, collapsed=collapsed, layout=diagram_layout(), folded=folded,
+        )
+        memo.update(fingerprint=fp, source=graph.source, collapsed=collapsed, folded=folded)
+    return memo["source"]
+
+def current_component_dots() -> list:
+    # DOT per connected component of the current diagram, rebuilt with it
+    current_dot()
+    memo = st.session_state.graph_memo
+    if memo.get("components_fp") != memo["fingerprint"]:
+        graphs = component_graphs(
+            st.session_state.entity_store, st.session_state.rel_store,
+            st.session_state.title, st.session_state.rankdir, cache=st.session_state.dot_cache,
+            focus=diagram_focus(), layout=diagram_layout(), folded=memo["folded"],
+        )
+        memo.update(components_fp=memo["fingerprint"], components=[g.source for g in graphs])
+    return memo["components"]
+
+def entity_search(query: str, limit: int = 20) -> list:
+    # ranked entity ids; the index catches up with any store edits first
+    index, store = st.session_state.search_index, st.session_state.entity_store
+    index.sync(store)
+    return [eid for eid in index.search(query, limit) if eid in store]
 
 def relationships_df() -> pd.DataFrame:
-    if not st.session_state.relationships:
-        return pd.DataFrame(columns=["source_id", "target_id", "label"])
-    return pd.DataFrame(st.session_state.relationships)
-
-def name_by_id(eid: str) -> str:
-    for e in st.session_state.entities:
-        if e.get("id") == eid:
-            return e.get("name", eid)
-    return eid
-
-def id_by_name(name: str) -> str:
-    for e in st.session_state.entities:
-        if e.get("name") == name:
-            return e.get("id")
-    return ""
-
-def scrub_new_custom_fields_from_df(df: pd.DataFrame):
-    for col in df.columns:
-        if col not in BASE_FIELDS and col not in st.session_state.custom_fields:
-            st.session_state.custom_fields.append(col)
+    columns = ["source_id", "target_id", "label"]
+    if not len(st.session_state.rel_store):
+        return pd.DataFrame(columns=columns)
+    return pd.DataFrame(list(st.session_state.rel_store), columns=columns)
 
 # --------------------------
-# Build Graphviz DOT
+# Rendering (local Graphviz and/or remote /render)
 # --------------------------
-def build_graph() -> Digraph:
-    g = Digraph("G")
-    g.attr(
-        rankdir=st.session_state.rankdir,
-        splines="ortho",        # allow curved lines
-        overlap="false",       # avoid line overlaps
-        bgcolor="white",
-        fontsize="18",
-        labelloc="t",
-        label=f'<<font point-size="28"><b>{st.session_state.title}</b></font>>'
+@st.cache_resource
+def get_render_cache() -> RenderCache:
+    # shared by all sessions; RENDER_CACHE_DIR enables the on-disk tier
+    return RenderCache(
+        max_bytes=int(os.environ.get("RENDER_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES)),
+        disk_dir=os.environ.get("RENDER_CACHE_DIR") or None,
     )
 
-
-    individual_ids = [e["id"] for e in st.session_state.entities if e.get("type") == "Individual"]
-
-    # Cluster for Individuals (border invisible)
-    if individual_ids:
-        with g.subgraph(name="cluster_individuals") as c:
-            c.attr(style="invis")
-            for e in st.session_state.entities:
-                if e["id"] in individual_ids:
-                    style = TYPE_STYLE.get(e.get("type", "Other"), TYPE_STYLE["Other"]).copy()
-                    label_lines = [f"<b>{e.get('name','')}</b> ({e.get('type','')})"]
-                    for fld in ["address","TFN","ABN","ACN"] + st.session_state.custom_fields:
-                        val = e.get(fld, "")
-                        if val: label_lines.append(f"{fld}: {val}")
-                    label = "<" + "<br/>".join(label_lines) + ">"
-                    c.node(e["id"], label=label, **style)
-
-    # Non-individuals outside cluster
-    for e in st.session_state.entities:
-        if e["id"] in individual_ids:
-            continue
-        style = TYPE_STYLE.get(e.get("type", "Other"), TYPE_STYLE["Other"]).copy()
-        label_lines = [f"<b>{e.get('name','')}</b> ({e.get('type','')})"]
-        for fld in ["address","TFN","ABN","ACN"] + st.session_state.custom_fields:
-            val = e.get(fld, "")
-            if val: label_lines.append(f"{fld}: {val}")
-        label = "<" + "<br/>".join(label_lines) + ">"
-        g.node(e["id"], label=label, **style)
-
-    # Edges with near-line labels
-    for r in st.session_state.relationships:
-       g.edge(
-    r["source_id"], r["target_id"],
-    label=r.get("label",""),
-    labelfloat="true",
-    fontsize="10",
-    labeldistance="0.5"   # just above 0, keeps it close but avoids collisions
-)
-
-    return g
-
-# --------------------------
-# Remote Rendering
-# --------------------------
-def render_remote(dot_source: str, fmt: str):
-    base = st.session_state.api_url.strip() or st.secrets.get("GRAPHVIZ_API_URL", "").strip()
-    if not base:
-        st.error("No Graphviz API URL set (Sidebar → Graphviz API URL). Or export DOT and render elsewhere.")
+@st.cache_resource
+def get_render_client(base_url: str) -> RemoteRenderClient:
+    # one pooled keep-alive client per renderer URL, shared by all sessions
+    return RemoteRenderClient(base_url)
+
+@st.cache_resource
+def get_worker_pool() -> GraphvizWorkerPool:
+    # long-lived Graphviz workers shared by all sessions; GRAPHVIZ_WORKERS sets the size
+    return GraphvizWorkerPool(size=int(os.environ.get("GRAPHVIZ_WORKERS", 2)))
+
+@st.cache_resource
+def get_renderer(base_url: str) -> AutoRenderer:
+    # warm worker pool / local `dot` when Graphviz is installed, the remote service
+    # when a URL is set; picks by measured latency and falls back on failure
+    backends = [WarmRenderer(get_worker_pool()), LocalRenderer()]
+    if base_url:
+        backends.append(RemoteRenderer(get_render_client(base_url)))
+    return AutoRenderer(backends)
+
+@st.cache_resource
+def get_export_manager() -> ExportManager:
+    return ExportManager(max_workers=int(os.environ.get("EXPORT_WORKERS", 4)))
+
+@st.cache_resource
+def get_layout_timings() -> LayoutTimings:
+    # measured per layout profile on this server, shared by all sessions
+    return LayoutTimings()
+
+@st.cache_resource
+def get_layout_manager() -> ExportManager:
+    # diagram refreshes get their own small pool so they never queue behind exports
+    return ExportManager(max_workers=2, max_pending=16)
+
+def api_base_url() -> str:
+    return st.session_state.api_url.strip() or st.secrets.get("GRAPHVIZ_API_URL", "").strip()
+
+def make_renderer():
+    # resolved on the script thread; the returned function is safe to run on export workers
+    renderer = get_renderer(api_base_url())
+    if not renderer.available():
         return None
-    try:
-        url = base.rstrip("/") + "/render"
-        resp = requests.post(url, json={"dot": dot_source, "format": fmt}, timeout=60)
-        if resp.status_code == 200:
-            return resp.content
-        st.error(f"Remote render failed: HTTP {resp.status_code} - {resp.text[:200]}")
-    except Exception as e:
-        st.error(f"Remote render error: {e}")
-    return None
+    cache = get_render_cache()
+    timings = get_layout_timings()
+    def render(dot_source: str, fmt: str) -> bytes:
+        def run():
+            # timed only on cache misses, so the figures are real layouts
+            t0 = time.monotonic()
+            data = renderer.render(dot_source, fmt)
+            timings.record_source(dot_source, time.monotonic() - t0)
+            return data
+        return cache.get_or_render(dot_source, fmt, "dot", run)
+    return render
+
+def component_renderer(render):
+    # lays unrelated groups out separately (in parallel) when there are several
+    if render is None or not st.session_state.split_components:
+        return render
+    sources = current_component_dots()
+    if len(sources) < 2:
+        return render
+    workers = int(os.environ.get("GRAPHVIZ_WORKERS", 2))
+    def render_split(dot_source: str, fmt: str) -> bytes:
+        return render_by_component(sources, fmt, render, dot_source, workers=workers)
+    return render_split
+
+def diagram_renderer(render, positions, out: dict):
+    # small edits reuse `positions` (see incremental_layout); the new positions,
+    # layout mode and time are left in `out` for the script thread
+    full = component_renderer(render)
+    def render_diagram(dot_source: str, fmt: str) -> bytes:
+        t0 = time.monotonic()
+        data, out["positions"], out["mode"] = render_with_positions(dot_source, fmt, render, positions, full)
+        out["seconds"] = time.monotonic() - t0
+        return data
+    return render_diagram
 
 # --------------------------
 # Sidebar Controls
@@ -160,10 +210,77 @@ with st.sidebar:
     )
     st.text_input("Graphviz API URL", key="api_url", placeholder="https://<your-renderer>")
     st.caption("Tip: set GRAPHVIZ_API_URL in Streamlit Secrets for production.")
+    render_stats = get_renderer(api_base_url()).stats()
+    st.caption("Renderers: " + ", ".join(
+        f"{name} " + ("unavailable" if not s["available"] else "cooling down" if s["cooling_down"]
+                      else f"{s['latency'] * 1000:.0f} ms" if s["latency"] is not None else "ready")
+        for name, s in render_stats.items()
+    ))
     st.session_state.rankdir = "LR" if st.session_state.rankdir_label.startswith("Left") else "TB"
+    st.selectbox("Layout engine", ["auto"] + list(LAYOUTS), key="layout_override",
+                 format_func=lambda p: "Automatic (by size)" if p == "auto" else LAYOUTS[p]["label"])
+    st.number_input("Layout time budget (s)", min_value=0.5, max_value=600.0, step=0.5, key="layout_budget",
+                    disabled=st.session_state.layout_override != "auto",
+                    help="Automatic picks the neatest layout expected to finish in this time.")
+    chosen = layout_profile(current_dot())
+    layout_stats = get_layout_timings().stats()
+    if chosen:
+        st.caption(f"Diagram: {LAYOUTS[chosen[0]]['label']}, {chosen[1]:,} nodes + edges.")
+    if layout_stats:
+        st.caption("Layout timings: " + "; ".join(
+            f"{LAYOUTS[p]['label']} {s['runs']}× avg {s['seconds'] / s['runs']:.2f} s "
+            f"({s['rate'] * 1000:.2f} ms per node/edge)" for p, s in layout_stats.items()
+        ))
+
+    st.subheader("Focus")
+    # the diagram shows only the k-hop neighbourhood of the chosen entities
+    store = st.session_state.entity_store
+    focus_query = st.text_input("Find entities to focus on", key="focus_q", placeholder="Type a name").strip()
+    focus_options = list(dict.fromkeys(st.session_state.focus_seeds + (entity_search(focus_query, 10) if focus_query else [])))
+    st.multiselect("Focus on", focus_options, key="focus_seeds", format_func=store.display_name,
+                   placeholder="Whole structure")
+    st.slider("Hops", 1, 6, key="focus_hops", disabled=not st.session_state.focus_seeds)
+    if st.session_state.focus_seeds:
+        near = st.session_state.rel_store.neighbourhood(st.session_state.focus_seeds, st.session_state.focus_hops)
+        st.caption(f"Showing {sum(eid in store for eid in near):,} of {len(store):,} entities.")
+    st.number_input("Node budget", min_value=20, max_value=100_000, step=50, key="node_budget",
+                    help="Larger diagrams collapse groups into summary nodes to stay under this many nodes.")
+    st.toggle("Lay out unrelated groups separately", key="split_components",
+              help="Each connected group is laid out on its own, in parallel, then packed together "
+                   "(one page per group in PDF exports).")
 
 st.title("🧬 Family / Group Structure Visualiser")
 
+# --------------------------
+# Global Search
+# --------------------------
+def show_in_editor(eid: str):
+    # narrow the entity grid to this one entity
+    st.session_state.ent_filter_types = []
+    st.session_state.ent_filter_text = eid
+    st.session_state.ent_page = 1
+
+def focus_on(eid: str):
+    st.session_state.focus_seeds = [eid]
+
+search_query = st.text_input("🔎 Search entities", key="global_search",
+                             placeholder="Name, ABN, ACN, TFN or custom field; typos are tolerated").strip()
+if search_query:
+    hits = entity_search(search_query, limit=10)
+    if hits:
+        hit_df = pd.DataFrame(st.session_state.entity_store.rows(hits))
+        st.dataframe(hit_df[["name", "type", "ABN", "ACN", "TFN", "id"]], hide_index=True)
+        sc1, sc2, sc3 = st.columns([3, 1, 1])
+        with sc1:
+            picked = st.selectbox("Result", hits, format_func=st.session_state.entity_store.display_name,
+                                  key="global_search_pick", label_visibility="collapsed")
+        with sc2:
+            st.button("Show in editor", on_click=show_in_editor, args=(picked,), key="global_search_show")
+        with sc3:
+            st.button("Focus diagram", on_click=focus_on, args=(picked,), key="global_search_focus")
+    else:
+        st.caption("No matching entities.")
+
 # --------------------------
 # CSV Upload (Append or Replace)
 # --------------------------
@@ -176,243 +293,511 @@ with up_col2:
 with up_col3:
     append_mode = st.toggle("Append to current data", value=False)
 
+def _import_progress(upload, label: str):
+    # progress is bytes consumed by the CSV reader over the upload size
+    bar = st.progress(0.0, text=label)
+    def update(rows: int):
+        frac = min(upload.tell() / max(upload.size, 1), 1.0)
+        bar.progress(frac, text=f"{label} {rows:,} rows")
+    return bar, update
+
+def import_entities(upload) -> dict:
+    # streamed in chunks: each chunk is validated and appended before the next is read
+    store = st.session_state.entity_store
+    bar, update = _import_progress(upload, "Importing entities…")
+    rows, added, issues = 0, 0, []
+    replace = not append_mode  # the old entities go only once the first chunk has validated
+    seen = {}  # name -> rows so far, for id-less files
+    for chunk in read_chunks(upload):
+        df_ent, chunk_issues = validate_entities(chunk, ENTITY_TYPES, existing=() if replace else store.ids())
+        if "id" not in df_ent.columns:
+            df_ent["id"] = name_ids(df_ent["name"], seen)
+        if replace:
+            store.replace_all([])
+            replace = False
+        added += store.extend(df_ent)
+        rows += len(chunk)
+        issues.append(chunk_issues)
+        update(rows)
+    bar.empty()
+    return _summary(f"Loaded {added} entities.", rows, added, issues, "entity")
+
+def import_relationships(upload) -> dict:
+    rel_store = st.session_state.rel_store
+    ent_frame = st.session_state.entity_store.frame()
+    bar, update = _import_progress(upload, "Importing relationships…")
+    rows, added, issues = 0, 0, []
+    replace = not append_mode  # as for entities: nothing is cleared before the first chunk resolves
+    for chunk in read_chunks(upload):
+        resolved, chunk_issues = resolve_relationships(chunk, ent_frame)
+        if replace:
+            rel_store.replace_all([])
+            replace = False
+        added += rel_store.extend(resolved.to_dict("records"))
+        rows += len(chunk)
+        issues.append(chunk_issues)
+        update(rows)
+    bar.empty()
+    return _summary(f"Loaded {added} relationships.", rows, added, issues, "relationship")
+
+def _summary(message: str, rows: int, added: int, issues: list, kind: str) -> dict:
+    summary = dict(message=message)
+    issues = concat_issues(issues)
+    if len(issues):
+        summary["warning"] = f"{len(issues)} problems in {kind} rows ({rows - added} of {rows} rows not imported)."
+        summary["issues"] = issues
+    return summary
+
+def import_once(kind: str, upload, apply_fn) -> dict:
+    # apply each uploaded file once per content hash; later reruns replay the summary
+    digests = st.session_state.import_digests
+    if upload.file_id not in digests:
+        digests[upload.file_id] = file_digest(upload.getbuffer())
+    key = (kind, digests[upload.file_id])
+    if st.button("🔁 Re-import", key=f"reimport_{kind}", help="Apply this file again"):
+        st.session_state.imports.pop(key, None)
+    if key not in st.session_state.imports:
+        upload.seek(0)
+        try:
+            st.session_state.imports[key] = apply_fn(upload)
+        except ValueError as e:  # includes pandas parser errors
+            st.session_state.imports[key] = dict(error=f"Import failed: {e}")
+    return st.session_state.imports[key]
+
+def show_import_summary(summary: dict):
+    if summary.get("error"):
+        st.error(summary["error"])
+        return
+    st.success(summary["message"])
+    if summary.get("warning"):
+        st.warning(summary["warning"])
+    if summary.get("issues") is not None:
+        st.dataframe(summary["issues"], hide_index=True)
+
 if ent_file:
-    df_ent = pd.read_csv(ent_file)
-    scrub_new_custom_fields_from_df(df_ent)
-    if "id" not in df_ent.columns:
-        df_ent["id"] = [str(uuid.uuid5(uuid.NAMESPACE_DNS, str(n))) for n in df_ent["name"].fillna("").astype(str)]
-    new_entities = df_ent.fillna("").to_dict("records")
-    if append_mode:
-        existing_ids = {e["id"] for e in st.session_state.entities}
-        for e in new_entities:
-            if e["id"] not in existing_ids:
-                st.session_state.entities.append(ensure_id(e))
-    else:
-        st.session_state.entities = [ensure_id(e) for e in new_entities]
-    st.success(f"Loaded {len(new_entities)} entities.")
+    with up_col1:
+        ent_summary = import_once("entities", ent_file, import_entities)
+    show_import_summary(ent_summary)
 
 if rel_file:
-    df_rel = pd.read_csv(rel_file)
-    if "source_id" not in df_rel.columns and "from" in df_rel.columns:
-        df_rel["source_id"] = df_rel["from"].apply(lambda n: id_by_name(str(n)))
-    if "target_id" not in df_rel.columns and "to" in df_rel.columns:
-        df_rel["target_id"] = df_rel["to"].apply(lambda n: id_by_name(str(n)))
-    if "label" not in df_rel.columns:
-        df_rel["label"] = ""
-    new_rels = df_rel[["source_id","target_id","label"]].fillna("").to_dict("records")
-    if append_mode:
-        st.session_state.relationships.extend(new_rels)
-    else:
-        st.session_state.relationships = new_rels
-    st.success(f"Loaded {len(new_rels)} relationships.")
+    with up_col2:
+        rel_summary = import_once("relationships", rel_file, import_relationships)
+    show_import_summary(rel_summary)
 
 # --------------------------
-# Add Entity
+# Editor Helpers (pagination, grid diff)
 # --------------------------
-st.subheader("👤 Add Entity")
-with st.form("add_entity_form", clear_on_submit=True):
-    c1,c2,c3 = st.columns(3)
-    with c1:
-        e_name = st.text_input("Name")
-        e_type = st.selectbox("Type", ENTITY_TYPES, index=0)
-    with c2:
-        e_address = st.text_input("Address")
-        e_tfn = st.text_input("TFN")
-    with c3:
-        e_abn = st.text_input("ABN")
-        e_acn = st.text_input("ACN")
-    # custom fields
-    custom_vals = {}
-    for f in st.session_state.custom_fields:
-        custom_vals[f] = st.text_input(f)
-    if st.form_submit_button("Add Entity"):
-        if not e_name:
-            st.warning("Please provide a name.")
-        else:
-            ent = ensure_id(dict(name=e_name, type=e_type, address=e_address, TFN=e_tfn, ABN=e_abn, ACN=e_acn))
-            ent.update({k:v for k,v in custom_vals.items()})
-            st.session_state.entities.append(ent)
-            st.success(f"Added entity {e_name}")
+PAGE_SIZES = [25, 50, 100, 250]
+
+def page_slice(items: list, key: str, label: str) -> list:
+    # page-size / page-number controls for `items`; returns the current page
+    size = st.session_state.get(f"{key}_size", PAGE_SIZES[0])
+    pages = max(1, -(-len(items) // size))
+    if st.session_state.get(f"{key}_page", 1) > pages:
+        st.session_state[f"{key}_page"] = pages  # filter or delete shrank the list
+    pc1, pc2, pc3 = st.columns([1, 1, 2])
+    with pc1:
+        st.selectbox("Rows per page", PAGE_SIZES, key=f"{key}_size")
+    with pc2:
+        page = st.number_input("Page", min_value=1, max_value=pages, step=1, key=f"{key}_page")
+    with pc3:
+        st.caption(f"{len(items)} {label}, page {page} of {pages}.")
+    return items[(page - 1) * size:page * size]
+
+def grid_changes(original: pd.DataFrame, edited: pd.DataFrame, fields: list):
+    # -> ({id: {field: new value}}, [ids ticked for deletion]) for one editor page
+    before = original.set_index("id")
+    after = edited.set_index("id")
+    after_fields = after[fields].fillna("").astype(str)
+    diff = after_fields.ne(before[fields])
+    updates = {
+        eid: {f: after_fields.at[eid, f] for f in fields if diff.at[eid, f]}
+        for eid in diff.index[diff.any(axis=1)]
+    }
+    deletes = after.index[after["_delete"].fillna(False).astype(bool)].tolist()
+    return updates, deletes
 
 # --------------------------
-# Manage Custom Fields
+# Entity Picker (typeahead)
 # --------------------------
-with st.expander("⚙️ Custom Fields", expanded=False):
-    cf1, cf2 = st.columns([2,1])
-    with cf1:
-        new_field = st.text_input("Add new custom field")
-        if st.button("Add Field"):
-            if new_field and new_field not in st.session_state.custom_fields and new_field not in BASE_FIELDS:
-                st.session_state.custom_fields.append(new_field)
-                st.success(f"Added custom field “{new_field}”.")
-    with cf2:
-        if st.session_state.custom_fields:
-            del_field = st.selectbox("Remove field", [""] + st.session_state.custom_fields)
-            if st.button("Delete Field") and del_field:
-                st.session_state.custom_fields.remove(del_field)
-                for e in st.session_state.entities:
-                    e.pop(del_field, None)
-                st.success(f"Removed field “{del_field}”.")
+def entity_picker(label: str, key: str, current: str = "", limit: int = 20):
+    # search box + short selectbox of the best matches, so no widget ships every entity;
+    # with an empty search it offers `current` (or the first few entities)
+    store = st.session_state.entity_store
+    query = st.text_input(f"Search {label.lower()}", key=f"{key}_q", placeholder="Type a name")
+    if query.strip():
+        options = entity_search(query.strip(), limit)
+        if not options:
+            st.caption("No matching entities.")
+    else:
+        options = [current] if current else store.match("", limit)
+    if current and not options:
+        options = [current]
+    return st.selectbox(label, options, format_func=store.display_name, key=key)
 
 # --------------------------
-# Entities (Edit/Delete with deferred delete)
+# Editor Panes (fragments)
 # --------------------------
-st.subheader("📋 Entities (Edit/Delete)")
-if st.session_state.entities:
-    for idx, e in enumerate(list(st.session_state.entities)):
-        with st.expander(f"{e['name']} — {e['type']}", expanded=False):
-            c1,c2,c3 = st.columns(3)
-            with c1:
-                new_name = st.text_input("Name", e.get("name",""), key=f"ent_name_{e['id']}")
-                new_type = st.selectbox("Type", ENTITY_TYPES, index=ENTITY_TYPES.index(e.get("type","Other")), key=f"ent_type_{e['id']}")
-            with c2:
-                new_address = st.text_input("Address", e.get("address",""), key=f"ent_addr_{e['id']}")
-                new_tfn = st.text_input("TFN", e.get("TFN",""), key=f"ent_tfn_{e['id']}")
-            with c3:
-                new_abn = st.text_input("ABN", e.get("ABN",""), key=f"ent_abn_{e['id']}")
-                new_acn = st.text_input("ACN", e.get("ACN",""), key=f"ent_acn_{e['id']}")
-            # custom fields inline
-            new_custom = {}
-            for f in st.session_state.custom_fields:
-                new_custom[f] = st.text_input(f, e.get(f,""), key=f"ent_{f}_{e['id']}")
-
-            uc1, uc2 = st.columns([1,1])
-            with uc1:
-                if st.button("Save Changes", key=f"save_ent_{e['id']}"):
-                    e.update(dict(name=new_name, type=new_type, address=new_address, TFN=new_tfn, ABN=new_abn, ACN=new_acn))
-                    e.update(new_custom)
-                    st.success("Saved.")
-            with uc2:
-                if st.button("Delete Entity", key=f"del_ent_{e['id']}"):
-                    st.session_state.ent_del_idx = idx  # defer actual deletion
-
-    # perform entity delete after loop
-    if st.session_state.ent_del_idx is not None:
-        idx = st.session_state.ent_del_idx
-        if 0 <= idx < len(st.session_state.entities):
-            ent_id = st.session_state.entities[idx]["id"]
-            st.session_state.relationships = [
-                r for r in st.session_state.relationships
-                if r.get("source_id") != ent_id and r.get("target_id") != ent_id
-            ]
-            st.session_state.entities.pop(idx)
-        st.session_state.ent_del_idx = None
-        st.rerun()
-else:
-    st.info("No entities yet. Add some above or import from CSV.")
+# Each pane reruns on its own when its widgets are used. An edit that only
+# changes what its own pane shows reruns just that pane; one that changes
+# another pane's content (renames, deletes, relationship counts) reruns the
+# app. The diagram pane notices every edit through the graph fingerprint.
+def rerun_panes(others: bool):
+    st.rerun(scope="app" if others else "fragment")
+
+@st.fragment
+def entity_pane():
+    # Add Entity
+    st.subheader("👤 Add Entity")
+    with st.form("add_entity_form", clear_on_submit=True):
+        c1,c2,c3 = st.columns(3)
+        with c1:
+            e_name = st.text_input("Name")
+            e_type = st.selectbox("Type", ENTITY_TYPES, index=0)
+        with c2:
+            e_address = st.text_input("Address")
+            e_tfn = st.text_input("TFN")
+        with c3:
+            e_abn = st.text_input("ABN")
+            e_acn = st.text_input("ACN")
+        # custom fields
+        custom_vals = {}
+        for f in st.session_state.entity_store.custom_fields:
+            custom_vals[f] = st.text_input(f)
+        if st.form_submit_button("Add Entity"):
+            if not e_name:
+                st.warning("Please provide a name.")
+            else:
+                ent = ensure_id(dict(name=e_name, type=e_type, address=e_address, TFN=e_tfn, ABN=e_abn, ACN=e_acn))
+                ent.update({k:v for k,v in custom_vals.items()})
+                st.session_state.entity_store.add(ent)
+                st.toast(f"Added entity {e_name}")
+                rerun_panes(others=True)  # relationship pickers and diagram
+
+    # Manage Custom Fields
+    with st.expander("⚙️ Custom Fields", expanded=False):
+        cf1, cf2 = st.columns([2,1])
+        with cf1:
+            new_field = st.text_input("Add new custom field")
+            if st.button("Add Field"):
+                if st.session_state.entity_store.add_field(new_field):
+                    st.success(f"Added custom field “{new_field}”.")
+        with cf2:
+            if st.session_state.entity_store.custom_fields:
+                del_field = st.selectbox("Remove field", [""] + st.session_state.entity_store.custom_fields)
+                if st.button("Delete Field") and del_field:
+                    st.session_state.entity_store.drop_field(del_field)
+                    st.success(f"Removed field “{del_field}”.")
+
+    # Entities (bulk grid editor, one page at a time)
+    st.subheader("📋 Entities (Edit/Delete)")
+    store = st.session_state.entity_store
+    if len(store):
+        dupes = store.duplicate_names()
+        if dupes:
+            st.warning("Several entities share a name: " + ", ".join(f"{n} (×{len(ids)})" for n, ids in dupes.items())
+                       + ". Pick them by their id suffix in the relationship editors.")
+        fl1, fl2 = st.columns([1,2])
+        with fl1:
+            filter_types = st.multiselect("Filter by type", ENTITY_TYPES, key="ent_filter_types")
+        with fl2:
+            filter_text = st.text_input("Filter by text", key="ent_filter_text")
+        shown = store.filter(types=filter_types, text=filter_text.strip())
+        page_ids = page_slice(shown, "ent", f"of {len(store)} entities shown" if len(shown) < len(store) else "entities")
+
+        # only this page goes to the browser, so rerun cost follows the page size
+        fields = BASE_FIELDS[1:] + store.custom_fields
+        page_df = pd.DataFrame(store.rows(page_ids), columns=["id"] + fields)
+        page_df.insert(0, "_delete", False)
+        page_df["_links"] = [st.session_state.rel_store.degree(eid) for eid in page_ids]
+        edited = st.data_editor(
+            page_df,
+            key=f"ent_grid_{store.revision}_{hash(tuple(page_ids))}",  # fresh editor once the page's data changes
+            hide_index=True,
+            num_rows="fixed",
+            disabled=["id", "_links"],
+            column_config={
+                "_delete": st.column_config.CheckboxColumn("Delete", width="small"),
+                "id": st.column_config.TextColumn("id", width="small"),
+                "type": st.column_config.SelectboxColumn("type", options=ENTITY_TYPES, required=True),
+                "_links": st.column_config.NumberColumn("Relationships", width="small"),
+            },
+        )
+        updates, deletes = grid_changes(page_df, edited, fields)
+        blank = [eid for eid, ch in updates.items() if "name" in ch and not ch["name"].strip()]
+        if blank:
+            st.error(f"{len(blank)} edited row(s) have an empty name; give them a name or undo the edit.")
+        if updates or deletes:
+            st.caption(f"Pending: {len(updates)} edited, {len(deletes)} to delete"
+                       + (f" (and {sum(st.session_state.rel_store.degree(eid) for eid in deletes)} of their relationships)"
+                          if deletes else "") + ".")
+        if st.button("Apply changes", disabled=bool(blank) or not (updates or deletes), key="ent_grid_apply"):
+            store.update_many({eid: ch for eid, ch in updates.items() if eid not in deletes})
+            for eid in deletes:
+                st.session_state.rel_store.remove_entity(eid)
+            store.remove_many(deletes)
+            # renames and deletes show up in the relationship pane; other edits stay local
+            rerun_panes(others=bool(deletes) or any("name" in ch for ch in updates.values()))
+    else:
+        st.info("No entities yet. Add some above or import from CSV.")
 
-# --------------------------
-# Add Relationship
-# --------------------------
-st.subheader("🔗 Add Relationship")
-if len(st.session_state.entities) < 2:
-    st.caption("Add at least two entities to create relationships.")
-else:
-    with st.form("add_rel_form", clear_on_submit=True):
-        names = [e["name"] for e in st.session_state.entities]
+entity_pane()
+
+@st.fragment
+def relationship_pane():
+    # Add Relationship
+    st.subheader("🔗 Add Relationship")
+    store = st.session_state.entity_store
+    if len(store) < 2:
+        st.caption("Add at least two entities to create relationships.")
+    else:
         s1, s2, s3 = st.columns(3)
         with s1:
-            from_name = st.selectbox("From", names, key="rel_from_name")
+            src_id = entity_picker("From", "rel_from_id")
         with s2:
-            to_name = st.selectbox("To", names, key="rel_to_name")
+            tgt_id = entity_picker("To", "rel_to_id")
         with s3:
-            rel_label = st.text_input("Label (e.g., owns, trustee for)")
-        if st.form_submit_button("Add Relationship"):
-            src_id = id_by_name(from_name)
-            tgt_id = id_by_name(to_name)
+            rel_label = st.text_input("Label (e.g., owns, trustee for)", key="rel_new_label")
+        if st.button("Add Relationship"):
             if src_id and tgt_id and src_id != tgt_id:
-                st.session_state.relationships.append(dict(source_id=src_id, target_id=tgt_id, label=rel_label))
-                st.success("Relationship added.")
+                st.session_state.rel_store.add(dict(source_id=src_id, target_id=tgt_id, label=rel_label))
+                st.toast("Relationship added.")
+                rerun_panes(others=True)  # relationship counts in the entity grid
             else:
                 st.warning("Invalid source/target.")
 
-# --------------------------
-# Relationships (Edit/Delete) with deferred delete
-# --------------------------
-st.subheader("🧷 Relationships (Edit/Delete)")
-
-if st.session_state.relationships:
-    names = [e["name"] for e in st.session_state.entities]
-
-    for i, r in enumerate(list(st.session_state.relationships)):
-        src_name = name_by_id(r.get("source_id", "")) or "(missing)"
-        tgt_name = name_by_id(r.get("target_id", "")) or "(missing)"
-        header = f"{src_name} → {tgt_name} — {r.get('label','')}"
-        with st.expander(header, expanded=False):
-            # preselect with tolerance to missing names
-            try:
-                idx_from = names.index(src_name)
-            except ValueError:
-                idx_from = 0 if names else 0
-            try:
-                idx_to = names.index(tgt_name)
-            except ValueError:
-                idx_to = 0 if names else 0
-
-            rr1, rr2, rr3 = st.columns(3)
-            with rr1:
-                new_from_name = st.selectbox(
-                    f"From #{i}",
-                    names if names else ["(no entities)"],
-                    index=min(idx_from, max(len(names)-1, 0)),
-                    key=f"r_from_{i}"
-                )
-            with rr2:
-                new_to_name = st.selectbox(
-                    f"To #{i}",
-                    names if names else ["(no entities)"],
-                    index=min(idx_to, max(len(names)-1, 0)),
-                    key=f"r_to_{i}"
-                )
-            with rr3:
-                new_label = st.text_input("Label", r.get("label",""), key=f"r_label_{i}")
-
-            rc1, rc2 = st.columns([1,1])
-            with rc1:
-                if st.button("Save Relationship", key=f"r_save_{i}"):
-                    r["source_id"] = id_by_name(new_from_name) or r.get("source_id","")
-                    r["target_id"] = id_by_name(new_to_name) or r.get("target_id","")
-                    r["label"] = new_label
-                    st.success("Saved relationship.")
-            with rc2:
-                if st.button("Delete Relationship", key=f"r_del_{i}"):
-                    st.session_state.rel_del_idx = i  # defer delete
-
-    # perform relationship delete after loop
-    if st.session_state.rel_del_idx is not None:
-        idx = st.session_state.rel_del_idx
-        if 0 <= idx < len(st.session_state.relationships):
-            st.session_state.relationships.pop(idx)
-        st.session_state.rel_del_idx = None
-        st.rerun()
-else:
-    st.caption("No relationships yet.")
+    # Relationships (Edit/Delete), keyed by relationship id
+    st.subheader("🧷 Relationships (Edit/Delete)")
+
+    rel_store = st.session_state.rel_store
+    if len(rel_store):
+        def rel_header(r: dict) -> str:
+            src_name = store.display_name(r.get("source_id", "")) or "(missing)"
+            tgt_name = store.display_name(r.get("target_id", "")) or "(missing)"
+            return f"{src_name} → {tgt_name} — {r.get('label','')}"
+
+        rel_filter = st.text_input("Filter relationships", key="rel_filter_text").strip().lower()
+        rels = [r for r in rel_store if not rel_filter or rel_filter in rel_header(r).lower()]
+        for r in page_slice(rels, "rel", "relationships"):
+            rid = r["id"]  # widget keys follow the relationship, not its position
+            with st.expander(rel_header(r), expanded=False):
+                rr1, rr2, rr3 = st.columns(3)
+                with rr1:
+                    new_from_id = entity_picker("From", f"r_from_{rid}", current=r.get("source_id", ""))
+                with rr2:
+                    new_to_id = entity_picker("To", f"r_to_{rid}", current=r.get("target_id", ""))
+                with rr3:
+                    new_label = st.text_input("Label", r.get("label",""), key=f"r_label_{rid}")
+
+                rc1, rc2 = st.columns([1,1])
+                with rc1:
+                    if st.button("Save Relationship", key=f"r_save_{rid}"):
+                        changes = dict(
+                            source_id=new_from_id or r.get("source_id",""),
+                            target_id=new_to_id or r.get("target_id",""),
+                            label=new_label,
+                        )
+                        moved = (changes["source_id"], changes["target_id"]) != (r.get("source_id"), r.get("target_id"))
+                        rel_store.update(rid, changes)
+                        st.toast("Saved relationship.")
+                        rerun_panes(others=moved)  # a moved endpoint changes relationship counts
+                with rc2:
+                    if st.button("Delete Relationship", key=f"r_del_{rid}"):
+                        st.session_state.rel_del_id = rid  # defer delete
+
+        # perform relationship delete after loop
+        if st.session_state.rel_del_id is not None:
+            rel_store.remove(st.session_state.rel_del_id)
+            st.session_state.rel_del_id = None
+            rerun_panes(others=True)
+    else:
+        st.caption("No relationships yet.")
+
+relationship_pane()
 
 # --------------------------
 # Diagram & Exports
 # --------------------------
 st.subheader("🗺️ Structure Diagram")
-graph = build_graph()
-st.graphviz_chart(graph)
+DIAGRAM_POLL_SECONDS = 1.0
+DIAGRAM_DEBOUNCE_SECONDS = 2.0  # re-layout once edits have settled this long
+
+def draw_diagram(key, draw):
+    # write into the slot only when what it shows changes, so idle polls send nothing
+    memo = st.session_state.graph_memo
+    if memo.get("drawn") != key:
+        draw()
+        memo["drawn"] = key
+
+@st.fragment(run_every=DIAGRAM_POLL_SECONDS)
+def diagram_pane():
+    # Layout runs in the background on the renderer; the last good SVG stays up
+    # with a "stale" badge until the new one lands. Without a server-side renderer
+    # the browser lays out the DOT itself, as before.
+    dot_source = current_dot()
+    fp = st.session_state.graph_memo["fingerprint"]
+    d = st.session_state.diagram
+    now = time.monotonic()
+    if fp != d["seen"]:
+        d["seen"], d["changed_at"] = fp, now  # another edit: restart the debounce
+
+    renderer = make_renderer()
+    if renderer is None:
+        draw_diagram(("dot", fp), lambda: diagram_slot.graphviz_chart(dot_source))
+        return
+
+    job = d["job"]
+    if job is not None and job.done:
+        if job.status == "done":
+            out = d["job_out"]
+            d.update(svg=job.data.decode("utf-8"), shown=d["job_fp"], svg_job=job.id, error=None,
+                     positions=out["positions"], layout_key=out["key"], last_layout=out)
+        else:
+            d.update(failed=d["job_fp"], error=job.error)
+        d["job"] = None
+
+    bar1, bar2, bar3 = st.columns([5, 1, 1])
+    with bar2:
+        refresh = st.button("Refresh", key="diagram_refresh", disabled=fp == d["shown"] and d["job"] is None)
+    with bar3:
+        # node positions are reused across small edits; this starts over
+        relayout = st.button("Re-layout", key="diagram_relayout", disabled=d["job"] is not None)
+    if relayout:
+        d["positions"] = None
+    settled = now - d["changed_at"] >= DIAGRAM_DEBOUNCE_SECONDS
+    if (d["job"] is None and (fp != d["shown"] or relayout) and (refresh or relayout or d["svg"] is None or settled)
+            and (refresh or relayout or fp != d["failed"])):  # a failed layout is only retried on request
+        profile = (layout_profile(dot_source) or ("",))[0]
+        # positions carry over only within one view: a different focus or level
+        # of detail is a different picture, not an edit of this one
+        focus = diagram_focus()
+        view = ((tuple(focus[0]), focus[1]) if focus else None, st.session_state.node_budget,
+                tuple(sorted(st.session_state.lod_expanded)))
+        key = (id(st.session_state.entity_store), st.session_state.rankdir, profile, view)
+        out = dict(key=key)
+        positions = d["positions"] if d["layout_key"] == key else None
+        try:
+            d["job"] = get_layout_manager().submit(dot_source, ["svg"], diagram_renderer(renderer, positions, out))[0]
+            d["job_fp"], d["job_out"] = fp, out
+        except ExportQueueFull:
+            pass  # next poll tries again
+    with bar1:
+        if fp != d["shown"]:
+            st.badge("Stale", icon=":material/schedule:", color="orange")
+            st.caption("Updating layout…" if d["job"] is not None
+                       else "Layout failed: " + d["error"] if fp == d["failed"]
+                       else "Waiting for edits to settle…")
+        else:
+            st.badge("Up to date", icon=":material/check:", color="green")
+            last = d["last_layout"]
+            if last:
+                st.caption(f"{'Incremental' if last['mode'] == 'incremental' else 'Full'} layout, "
+                           f"{last['seconds']:.1f} s")
+
+    if d["svg"] is not None:
+        # keyed by job: a re-layout of an unchanged graph is a new picture too
+        draw_diagram(("svg", d["svg_job"]), lambda: diagram_slot.image(d["svg"], width="stretch"))
+    elif fp == d["failed"]:
+        draw_diagram(("dot", fp), lambda: diagram_slot.graphviz_chart(dot_source))
+
+def group_label(key: str, members: int) -> str:
+    hub, typ = key.split("|", 1)
+    typ = typ.split("|", 1)[0]  # "*|type|part" when laid out in parts
+    noun = TYPE_PLURAL.get(typ, typ)
+    if hub == "*":
+        return f"{members:,} more {noun}"
+    return f"{members:,} {noun} under {st.session_state.entity_store.display_name(hub)}"
+
+def expand_group(key: str):
+    st.session_state.lod_expanded = st.session_state.lod_expanded + [key]
+
+def collapse_groups():
+    st.session_state.lod_expanded = []
+
+current_dot()  # fills graph_memo["collapsed"]
+collapsed = st.session_state.graph_memo.get("collapsed") or {}
+hub_keys = [k for k in collapsed if not k.startswith("*|")]
+overflow = {}  # type -> entities folded to fit the budget, over all parts
+for k, n in collapsed.items():
+    if k.startswith("*|"):
+        typ = k.split("|")[1]
+        overflow[typ] = overflow.get(typ, 0) + n
+if collapsed or st.session_state.lod_expanded:
+    with st.expander(f"Level of detail: {len(hub_keys) + len(overflow)} collapsed group(s)"):
+        # summary nodes open from here rather than by clicking them: a link in the
+        # diagram would reload the page and lose the session
+        if hub_keys:
+            lc1, lc2 = st.columns([4, 1])
+            with lc1:
+                pick = st.selectbox("Collapsed group", hub_keys, key="lod_pick", label_visibility="collapsed",
+                                    format_func=lambda k: group_label(k, collapsed[k]))
+            with lc2:
+                st.button("Expand", on_click=expand_group, args=(pick,), key="lod_expand")
+        if overflow:
+            st.caption("Folded to fit the budget: " + ", ".join(
+                group_label(f"*|{typ}", n) for typ, n in overflow.items()
+            ) + ". Raise the node budget or focus on fewer entities to see them.")
+        if st.session_state.lod_expanded:
+            st.button("Collapse all again", key="lod_reset", on_click=collapse_groups)
+
+diagram_bar = st.container()
+diagram_slot = st.empty()
+st.session_state.graph_memo.pop("drawn", None)  # a full run starts with an empty slot
+with diagram_bar:
+    diagram_pane()
 
 st.subheader("📤 Export")
-ec1, ec2, ec3, ec4 = st.columns(4)
-with ec1:
-    if st.button("Export PNG"):
-        data = render_remote(graph.source, "png")
-        if data:
-            st.download_button("Download PNG", data=data, file_name="structure.png", mime="image/png")
-with ec2:
-    if st.button("Export PDF"):
-        data = render_remote(graph.source, "pdf")
-        if data:
-            st.download_button("Download PDF", data=data, file_name="structure.pdf", mime="application/pdf")
-with ec3:
-    if st.button("Export DOT"):
-        st.download_button("Download DOT", data=graph.source, file_name="structure.dot", mime="text/vnd.graphviz")
-with ec4:
-    if st.button("Export CSVs"):
-        e_csv = entities_df().to_csv(index=False).encode("utf-8")
-        r_csv = relationships_df().to_csv(index=False).encode("utf-8")
-        st.download_button("Entities CSV", e_csv, file_name="entities.csv", mime="text/csv")
-        st.download_button("Relationships CSV", r_csv, file_name="relationships.csv", mime="text/csv")
+MAX_EXPORT_JOBS = 12
+
+def export_status(polling: bool):
+    # reruns on its own while jobs are pending; one full rerun once they finish
+    jobs = st.session_state.export_jobs
+    for job in jobs:
+        meta = EXPORT_FORMATS[job.fmt]
+        j1, j2 = st.columns([1, 3])
+        with j1:
+            st.write(f"**{job.fmt.upper()}** · {job.status} · {job.elapsed:.1f}s")
+        with j2:
+            if job.status == "done":
+                st.download_button(f"Download {job.fmt.upper()}", data=job.data, file_name=meta["file_name"],
+                                   mime=meta["mime"], key=f"dl_{job.id}")
+            elif job.status == "failed":
+                st.error(job.error)
+    if polling and not any(not j.done for j in jobs):
+        st.rerun()
+
+@st.fragment
+def export_pane():
+    ex1, ex2 = st.columns([3, 1])
+    with ex1:
+        export_formats = st.multiselect("Formats", list(EXPORT_FORMATS), default=["png", "pdf"],
+                                        format_func=str.upper, key="export_formats")
+    with ex2:
+        if st.button("Start export", disabled=not export_formats):
+            renderer = make_renderer()
+            if renderer is None:
+                st.error("Graphviz is not installed here and no Graphviz API URL is set (Sidebar → Graphviz API URL). "
+                         "Or export DOT and render elsewhere.")
+            else:
+                try:
+                    new_jobs = get_export_manager().submit(current_dot(), export_formats, component_renderer(renderer))
+                    st.session_state.export_jobs = (new_jobs + st.session_state.export_jobs)[:MAX_EXPORT_JOBS]
+                    st.rerun()  # full run, so the job list below starts polling
+                except ExportQueueFull as e:
+                    st.warning(str(e))
+
+    ec3, ec4 = st.columns(2)
+    with ec3:
+        if st.button("Export DOT"):
+            st.download_button("Download DOT", data=current_dot(), file_name="structure.dot", mime="text/vnd.graphviz")
+    with ec4:
+        if st.button("Export CSVs"):
+            e_csv = entities_df().to_csv(index=False).encode("utf-8")
+            r_csv = relationships_df().to_csv(index=False).encode("utf-8")
+            st.download_button("Entities CSV", e_csv, file_name="entities.csv", mime="text/csv")
+            st.download_button("Relationships CSV", r_csv, file_name="relationships.csv", mime="text/csv")
+
+export_pane()
+if st.session_state.export_jobs:
+    pending = any(not j.done for j in st.session_state.export_jobs)
+    st.fragment(export_status, run_every=1.0 if pending else None)(pending)
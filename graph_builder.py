@@ -0,0 +1,448 @@
+import re
+import threading
+
+from graphviz import Digraph
+
+# --------------------------
+# Graph Styles
+# --------------------------
+TYPE_STYLE = {
+    "Individual": dict(shape="ellipse", fillcolor="#3b82f6", style="filled", fontcolor="white"),
+    "Company":    dict(shape="box",     fillcolor="#10b981", style="filled", fontcolor="white"),
+    "Trust":      dict(shape="box", fillcolor="#1f2937", style="filled", fontcolor="white"),
+    "SMSF":       dict(shape="box", fillcolor="#7c3aed", style="filled", fontcolor="white"),
+    "Other":      dict(shape="triangle",     fillcolor="#9ca3af", style="filled", fontcolor="white"),
+}
+LABEL_FIELDS = ["address", "TFN", "ABN", "ACN"]
+TYPE_PLURAL = {"Individual": "individuals", "Company": "companies", "Trust": "trusts", "SMSF": "SMSFs", "Other": "others"}
+
+# --------------------------
+# DOT Fragment Cache
+# --------------------------
+# One DOT line per entity / relationship, keyed by the store's per-item
+# version (plus the custom field list for node labels), so a rerun only
+# re-emits the fragments of items that changed.
+
+
+_scratch = threading.local()  # one reusable Digraph per script thread
+
+
+def _scratch_graph() -> Digraph:
+    g = getattr(_scratch, "graph", None)
+    if g is None:
+        g = _scratch.graph = Digraph()
+    g.body.clear()
+    return g
+
+
+def node_fragment(e: dict, custom_fields) -> str:
+    style = TYPE_STYLE.get(e.get("type", "Other"), TYPE_STYLE["Other"])
+    label_lines = [f"<b>{e.get('name','')}</b> ({e.get('type','')})"]
+    for fld in LABEL_FIELDS + list(custom_fields):
+        val = e.get(fld, "")
+        if val: label_lines.append(f"{fld}: {val}")
+    label = "<" + "<br/>".join(label_lines) + ">"
+    scratch = _scratch_graph()
+    scratch.node(e["id"], label=label, **style)
+    return scratch.body[0]
+
+
+def edge_fragment(r: dict) -> str:
+    scratch = _scratch_graph()
+    scratch.edge(
+        r["source_id"], r["target_id"],
+        label=r.get("label",""),
+        labelfloat="true",
+        fontsize="10",
+        labeldistance="0.5"   # just above 0, keeps it close but avoids collisions
+    )
+    return scratch.body[0]
+
+
+class FragmentCache:
+    def __init__(self):
+        self._nodes = {}  # entity id -> ((version, custom_fields), fragment)
+        self._edges = {}  # rel id -> (version, fragment)
+        self.hits = 0
+        self.misses = 0
+
+    def nodes(self, ids, versions, custom_fields, load_rows) -> list:
+        # fragments for `ids`; only the misses are loaded (in one batch) and rendered
+        fields = tuple(custom_fields)
+        frags = [None] * len(ids)
+        missing = []
+        for i, (eid, version) in enumerate(zip(ids, versions)):
+            hit = self._nodes.get(eid)
+            if hit is not None and hit[0] == (version, fields):
+                frags[i] = hit[1]
+            else:
+                missing.append(i)
+        self.hits += len(ids) - len(missing)
+        self.misses += len(missing)
+        if missing:
+            for i, e in zip(missing, load_rows([ids[i] for i in missing])):
+                frags[i] = node_fragment(e, fields)
+                self._nodes[e["id"]] = ((versions[i], fields), frags[i])
+        return frags
+
+    def edge(self, r: dict, version: int) -> str:
+        hit = self._edges.get(r["id"])
+        if hit is not None and hit[0] == version:
+            self.hits += 1
+            return hit[1]
+        self.misses += 1
+        frag = edge_fragment(r)
+        self._edges[r["id"]] = (version, frag)
+        return frag
+
+    def prune(self, node_ids, edge_ids):
+        # forget fragments of deleted entities / relationships
+        if len(self._nodes) > len(node_ids):
+            self._nodes = {k: v for k, v in self._nodes.items() if k in node_ids}
+        if len(self._edges) > len(edge_ids):
+            self._edges = {k: v for k, v in self._edges.items() if k in edge_ids}
+
+
+# --------------------------
+# Level of Detail
+# --------------------------
+# Above a node budget, dense groups fold into one summary node each: first the
+# dependents of one type under a single hub (every incoming relationship comes
+# from that hub, e.g. the companies under a trust), largest groups first. If
+# that is not enough, everything except the seeds, expanded groups and the
+# best-connected entities folds per type, so Graphviz never gets more than
+# `budget` nodes (unless there are more seeds than that). When the diagram is
+# laid out in parts (component_graphs) the plan is still made once for the
+# whole diagram: each part gets its own per-type nodes ("*|type|part") if
+# those fit the budget, otherwise the parts share them ("*|type") and
+# component_graphs lays those parts out together.
+
+
+def summary_node_id(key: str) -> str:
+    return f"lod|{key}"  # no ":" - the graphviz package reads that as a port in edges
+
+
+def hub_groups(ids, types, rel_store, protect=()) -> dict:
+    # "hub|type" -> member ids, for groups of two or more dependents
+    present = set(ids)
+    groups = {}
+    for eid, typ in zip(ids, types):
+        if eid in protect:
+            continue
+        parents = {r.get("source_id", "") for r in rel_store.edges_to(eid)} - {eid}
+        if len(parents) == 1:
+            hub = parents.pop()
+            if hub in present:
+                groups.setdefault(f"{hub}|{typ}", []).append(eid)
+    return {k: v for k, v in groups.items() if len(v) > 1}
+
+
+def level_of_detail(ids, types, rel_store, budget: int, expanded=(), protect=(), parts=None) -> dict:
+    # entity id -> summary key for the entities folded away; parts, if given,
+    # maps entity id -> the separately laid-out graph it ends up in
+    if len(ids) <= budget:
+        return {}
+    protect = set(protect)
+    expanded = set(expanded)
+    folded = {}
+    count = len(ids)
+    candidates = hub_groups(ids, types, rel_store, protect)
+    for key, members in sorted(candidates.items(), key=lambda kv: -len(kv[1])):
+        if count <= budget:
+            return folded
+        if key in expanded:
+            continue
+        for eid in members:
+            folded[eid] = key
+        count -= len(members) - 1
+    if count <= budget:
+        return folded
+    # fallback: keep the seeds, then members of expanded groups, then the
+    # best-connected entities; fold the rest into one node per type
+    wanted = {eid for key in expanded if key in candidates for eid in candidates[key] + [key.split("|", 1)[0]]}
+    rank = sorted(range(len(ids)), key=lambda i: (ids[i] not in protect, ids[i] not in wanted,
+                                                  -rel_store.degree(ids[i])))
+    floor = len(protect & set(ids))
+
+    def fit(summary):
+        # (entities kept, whether they fit alongside the summary nodes they need)
+        keep = max(budget, floor)
+        while keep > floor:
+            needed = len({summary(i) for i in rank[keep:]})
+            if keep + needed <= budget:
+                return keep, True
+            keep = max(budget - needed, floor)
+        return keep, keep + len({summary(i) for i in rank[keep:]}) <= budget
+
+    if parts:
+        keep, fits = fit(lambda i: (parts[ids[i]], types[i]))
+        if fits:
+            return {ids[i]: f"*|{types[i]}|{parts[ids[i]]}" for i in rank[keep:]}
+    keep, _ = fit(lambda i: types[i])
+    return {ids[i]: f"*|{types[i]}" for i in rank[keep:]}
+
+
+def summary_fragment(key: str, members: int, hub_name: str) -> str:
+    hub, typ = key.split("|", 1)
+    typ = typ.split("|", 1)[0]  # "*|type|part" in component graphs
+    style = dict(TYPE_STYLE.get(typ, TYPE_STYLE["Other"]))
+    style.update(style=style["style"] + ",dashed", peripheries="2")
+    noun = TYPE_PLURAL.get(typ, typ) if members > 1 else typ.lower() if typ != "SMSF" else typ
+    if hub == "*":
+        label = f"<<b>{members:,} more {noun}</b>>"
+    else:
+        label = f"<<b>{members:,} {noun}</b><br/>under {hub_name}>"
+    scratch = _scratch_graph()
+    scratch.node(summary_node_id(key), label=label, **style)
+    return scratch.body[0]
+
+
+# --------------------------
+# Layout Selection
+# --------------------------
+# Engine and edge routing are picked from the size of the graph (nodes +
+# edges actually emitted): orthogonal routing is the neatest but slowest,
+# polylines are much cheaper, and sfdp with overlap removal is the only
+# option that stays interactive for thousands of nodes. Once a profile has
+# been timed, its measured cost per element decides against the latency
+# budget instead of the fixed limits. The choice goes into the DOT `layout`
+# attribute, so every backend honours it.
+
+LAYOUTS = {
+    "dot-ortho":    dict(label="dot, orthogonal edges", limit=300,
+                         attrs=dict(layout="dot", splines="ortho", overlap="false")),
+    "dot-polyline": dict(label="dot, polyline edges", limit=5000,
+                         attrs=dict(layout="dot", splines="polyline", overlap="false")),
+    "sfdp":         dict(label="sfdp, straight edges", limit=None,
+                         attrs=dict(layout="sfdp", splines="line", overlap="prism", outputorder="edgesfirst")),
+}
+_PROFILE_COMMENT = re.compile(r"// layout (\S+) (\d+)")
+
+
+def layout_profile(dot_source: str):
+    # (profile, elements) from build_graph's header comment, or None
+    m = _PROFILE_COMMENT.match(dot_source)
+    return (m.group(1), int(m.group(2))) if m and m.group(1) in LAYOUTS else None
+
+
+class LayoutTimings:
+    # measured layout + render seconds per profile, shared by render threads
+    def __init__(self, alpha: float = 0.3):
+        self.alpha = alpha
+        self._lock = threading.Lock()
+        self._stats = {}  # profile -> dict(runs, seconds, rate (EWMA seconds per element))
+
+    def record(self, profile: str, elements: int, seconds: float):
+        rate = seconds / max(elements, 1)
+        with self._lock:
+            s = self._stats.setdefault(profile, dict(runs=0, seconds=0.0, rate=rate))
+            s["runs"] += 1
+            s["seconds"] += seconds
+            s["rate"] = self.alpha * rate + (1 - self.alpha) * s["rate"]
+
+    def record_source(self, dot_source: str, seconds: float):
+        # attribute a render to the profile build_graph noted in its header comment
+        noted = layout_profile(dot_source)
+        if noted is not None:
+            self.record(*noted, seconds)
+
+    def estimate(self, profile: str, elements: int):
+        with self._lock:
+            s = self._stats.get(profile)
+            return None if s is None else s["rate"] * elements
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {name: dict(s) for name, s in self._stats.items()}
+
+
+def choose_layout(elements: int, override: str = "auto", budget: float = None,
+                  timings: LayoutTimings = None) -> str:
+    # the neatest profile expected to finish within `budget` seconds
+    if override in LAYOUTS:
+        return override
+    for name, spec in LAYOUTS.items():
+        est = timings.estimate(name, elements) if timings is not None and budget else None
+        if est is not None:
+            if est <= budget:
+                return name
+        elif spec["limit"] is None or elements <= spec["limit"]:
+            return name
+    return "sfdp"
+
+
+# --------------------------
+# Build Graphviz DOT
+# --------------------------
+def graph_fingerprint(entity_store, rel_store, title: str, rankdir: str, focus=None, lod=None, layout=None) -> tuple:
+    # everything build_graph reads; equal fingerprints give identical DOT
+    # (layout timings only nudge the automatic choice, so they are left out)
+    focus = (tuple(focus[0]), focus[1]) if focus else None
+    lod = (lod[0], tuple(sorted(lod[1]))) if lod else None
+    layout = layout[:2] if layout else None
+    return (id(entity_store), entity_store.revision, id(rel_store), rel_store.revision, title, rankdir, focus, lod,
+            layout)
+
+
+def diagram_ids(entity_store, rel_store, focus=None) -> tuple:
+    # (entity ids the diagram covers, seed ids): everything, or the focus neighbourhood
+    if not focus:
+        return entity_store.ids(), []
+    seeds = [eid for eid in focus[0] if eid in entity_store]
+    near = rel_store.neighbourhood(seeds, focus[1])
+    return [eid for eid in near if eid in entity_store], seeds
+
+
+def component_groups(ids, rel_store, batch: int = 50) -> list:
+    # connected components of `ids`, largest first; components under `batch`
+    # entities share a group so that scattered singletons don't each cost a layout
+    groups = []
+    for comp in rel_store.components(ids):
+        if len(comp) < batch and groups and len(groups[-1]) + len(comp) <= batch:
+            groups[-1].extend(comp)
+        else:
+            groups.append(list(comp))
+    return groups
+
+
+def fold_plan(entity_store, rel_store, focus=None, lod=None, split: bool = False, batch: int = 50) -> dict:
+    # the level-of-detail plan for the whole diagram (entity id -> summary key),
+    # shared by build_graph and component_graphs so both fold the same entities;
+    # split=True plans per-part summary nodes for component_graphs where they fit
+    ids, seeds = diagram_ids(entity_store, rel_store, focus)
+    if not lod or len(ids) <= lod[0]:
+        return {}
+    parts = None
+    if split:
+        parts = {eid: i for i, group in enumerate(component_groups(ids, rel_store, batch)) for eid in group}
+    return level_of_detail(ids, entity_store.column("type", ids), rel_store, lod[0], lod[1], seeds, parts)
+
+
+def build_graph(entity_store, rel_store, title: str, rankdir: str, cache: FragmentCache = None,
+                focus=None, lod=None, collapsed: dict = None, subset=None, layout=None,
+                folded: dict = None) -> Digraph:
+    # focus=(seed ids, hops) emits only the entities within `hops` relationships
+    # of a seed (either direction) and the relationships among them, so the
+    # cost follows the neighbourhood rather than the whole structure.
+    # lod=(node budget, expanded summary keys) folds groups into summary nodes;
+    # `collapsed`, if given, is filled with summary key -> member count.
+    # folded=a fold_plan to apply instead of working one out from lod.
+    # subset=ids restricts the graph to those entities (one connected component).
+    # layout=(profile or "auto", latency budget seconds, LayoutTimings) picks
+    # engine and edge routing (see choose_layout); dot with ortho edges if omitted
+    cache = cache if cache is not None else FragmentCache()
+    g = Digraph("G")
+    g.attr(
+        rankdir=rankdir,
+        bgcolor="white",
+        fontsize="18",
+        labelloc="t",
+        label=f'<<font point-size="28"><b>{title}</b></font>>' if title else ""
+    )
+
+
+    if subset is None:
+        ids, seeds = diagram_ids(entity_store, rel_store, focus)
+    else:
+        ids = list(subset)
+        seeds = [eid for eid in focus[0] if eid in set(ids)] if focus else []
+    partial = bool(focus) or subset is not None
+    if partial:
+        members = set(ids)
+        rels = {}
+        for eid in ids:
+            for r in rel_store.edges_from(eid):
+                if r.get("target_id", "") in members:
+                    rels[r["id"]] = r
+        rels = list(rels.values())
+        types = entity_store.column("type", ids)
+    else:
+        rels = list(rel_store)
+        types = entity_store.column("type")
+    all_ids = ids
+
+    if folded is not None:
+        folded = {eid: folded[eid] for eid in ids if eid in folded}
+    else:
+        folded = level_of_detail(ids, types, rel_store, lod[0], lod[1], seeds) if lod else {}
+    groups = {}
+    if folded:
+        for eid, key in folded.items():
+            groups[key] = groups.get(key, 0) + 1
+        shown = [i for i, eid in enumerate(ids) if eid not in folded]
+        ids = [ids[i] for i in shown]
+        types = [types[i] for i in shown]
+    if collapsed is not None:
+        collapsed.clear()
+        collapsed.update(groups)
+
+    # one pass: each label is built once (or served from cache) and routed by type
+    frags = cache.nodes(ids, [entity_store.version(eid) for eid in ids], entity_store.custom_fields, entity_store.rows)
+    individuals, others = [], []
+    for typ, frag in zip(types, frags):
+        (individuals if typ == "Individual" else others).append(frag)
+    for key, members in groups.items():
+        hub = key.split("|", 1)[0]
+        others.append(summary_fragment(key, members, entity_store.name_by_id(hub)))
+
+    # Cluster for Individuals (border invisible)
+    if individuals:
+        c = Digraph(name="cluster_individuals")
+        c.attr(style="invis")
+        c.body.extend(individuals)
+        g.subgraph(c)
+
+    # Non-individuals outside cluster
+    g.body.extend(others)
+
+    for eid in seeds:  # outline the seeds; later attributes merge into the node
+        g.node(eid, penwidth="4", color="#f59e0b")
+
+    # Edges with near-line labels; edges touching a summary node merge into one
+    # per (source, target) pair, and edges inside a group are dropped
+    merged = {}
+    present = set(all_ids) if folded else None
+    for r in rels:
+        src, dst = r.get("source_id", ""), r.get("target_id", "")
+        if present is not None and (src not in present or dst not in present):
+            continue  # a dangling endpoint would be an extra, unbudgeted node
+        if src not in folded and dst not in folded:
+            g.body.append(cache.edge(r, rel_store.version(r["id"])))
+            continue
+        src = summary_node_id(folded[src]) if src in folded else src
+        dst = summary_node_id(folded[dst]) if dst in folded else dst
+        if src != dst:
+            labels = merged.setdefault((src, dst), {})
+            labels[r.get("label", "")] = labels.get(r.get("label", ""), 0) + 1
+    for (src, dst), labels in merged.items():
+        label = ", ".join(f"{lbl} ×{n}" if n > 1 else lbl for lbl, n in labels.items() if lbl)
+        g.edge(src, dst, label=label, labelfloat="true", fontsize="10", labeldistance="0.5", style="dashed")
+
+    elements = len(ids) + len(groups) + len(rels)
+    profile = choose_layout(elements, *layout) if layout else "dot-ortho"
+    g.graph_attr.update(LAYOUTS[profile]["attrs"])
+    g.comment = f"layout {profile} {elements}"  # read back by LayoutTimings.record_source
+
+    if not partial:  # a partial build sees only part of the graph, so keeps the rest cached
+        cache.prune(set(all_ids), {r["id"] for r in rels})
+    return g
+
+
+def component_graphs(entity_store, rel_store, title: str, rankdir: str, cache: FragmentCache = None,
+                     focus=None, lod=None, layout=None, batch: int = 50, folded: dict = None) -> list:
+    # one Digraph per component group (component_groups), for laying them out
+    # independently. The title goes on the first. Entities fold by one plan
+    # for the whole diagram (`folded`, else fold_plan(split=True)), so the node
+    # budget holds across all the graphs together; groups sharing a "*|type"
+    # summary node are connected through it, so they make one graph.
+    ids, _ = diagram_ids(entity_store, rel_store, focus)
+    groups = component_groups(ids, rel_store, batch)
+    if folded is None:
+        folded = fold_plan(entity_store, rel_store, focus, lod, split=True, batch=batch)
+    shared = {eid for eid, key in folded.items() if key.startswith("*|") and key.count("|") == 1}
+    if shared:
+        together = [group for group in groups if not shared.isdisjoint(group)]
+        groups = [[eid for group in together for eid in group]] + [g for g in groups if shared.isdisjoint(g)]
+    return [build_graph(entity_store, rel_store, title if i == 0 else "", rankdir, cache=cache,
+                        focus=focus, subset=group, layout=layout, folded=folded)
+            for i, group in enumerate(groups)]
@@ -0,0 +1,285 @@
+import ctypes
+import ctypes.util
+import json
+import os
+import queue
+import select
+import struct
+import subprocess
+import sys
+import threading
+import time
+
+# --------------------------
+# Warm Graphviz Worker Pool
+# --------------------------
+# Spawning `dot` for every export reloads its plugins and fonts each time.
+# Instead we keep a few long-lived worker processes (this module run as a
+# script) that load libgvc once through ctypes and render jobs sent over
+# their stdin/stdout. Workers are recycled after `max_jobs` renders or when
+# their RSS grows past `max_rss_mb`, and killed if a job overruns its timeout.
+#
+# Wire format, both directions: 4-byte big-endian length + payload.
+#   request:  JSON header {"fmt", "engine"} frame, then the DOT source frame
+#   response: one status byte (b"R" ready, b"O" ok, b"E" error) + payload frame
+
+_LEN = struct.Struct(">I")
+
+
+class WorkerError(Exception):
+    pass
+
+
+class WorkerUnavailable(WorkerError):
+    # no worker could take the job (pool down, spawn failed, worker died);
+    # the DOT itself may be fine
+    pass
+
+
+# ---- worker side ----
+def _load_graphviz():
+    gvc_path = ctypes.util.find_library("gvc")
+    cgraph_path = ctypes.util.find_library("cgraph")
+    if not gvc_path or not cgraph_path:
+        raise OSError("libgvc / libcgraph not found")
+    gvc = ctypes.CDLL(gvc_path)
+    cgraph = ctypes.CDLL(cgraph_path)
+    gvc.gvContext.restype = ctypes.c_void_p
+    cgraph.agmemread.restype = ctypes.c_void_p
+    cgraph.agmemread.argtypes = [ctypes.c_char_p]
+    cgraph.agclose.argtypes = [ctypes.c_void_p]
+    cgraph.agget.restype = ctypes.c_char_p
+    cgraph.agget.argtypes = [ctypes.c_void_p, ctypes.c_char_p]
+    gvc.gvLayout.argtypes = [ctypes.c_void_p, ctypes.c_void_p, ctypes.c_char_p]
+    gvc.gvFreeLayout.argtypes = [ctypes.c_void_p, ctypes.c_void_p]
+    # the length out-param is `unsigned int *` before Graphviz 3 and `size_t *`
+    # after; a zeroed size_t reads back correctly for both on little-endian hosts
+    gvc.gvRenderData.argtypes = [ctypes.c_void_p, ctypes.c_void_p, ctypes.c_char_p,
+                                 ctypes.POINTER(ctypes.POINTER(ctypes.c_char)), ctypes.POINTER(ctypes.c_size_t)]
+    gvc.gvFreeRenderData.argtypes = [ctypes.POINTER(ctypes.c_char)]
+    return gvc, cgraph, gvc.gvContext()
+
+
+def _render(lib, errors: list, dot: bytes, fmt: str, engine: str) -> bytes:
+    gvc, cgraph, ctx = lib
+    del errors[:]
+    g = cgraph.agmemread(dot)
+    if not g:
+        raise WorkerError("".join(errors).strip() or "could not parse DOT source")
+    try:
+        # a `layout` graph attribute picks the engine, as it does for the dot command
+        engine = (cgraph.agget(g, b"layout") or b"").decode() or engine
+        if gvc.gvLayout(ctx, g, engine.encode()) != 0:
+            raise WorkerError("".join(errors).strip() or f"{engine} layout failed")
+        try:
+            buf = ctypes.POINTER(ctypes.c_char)()
+            length = ctypes.c_size_t(0)
+            if gvc.gvRenderData(ctx, g, fmt.encode(), ctypes.byref(buf), ctypes.byref(length)) != 0:
+                raise WorkerError("".join(errors).strip() or f"rendering {fmt} failed")
+            data = ctypes.string_at(buf, length.value)
+            gvc.gvFreeRenderData(buf)
+            return data
+        finally:
+            gvc.gvFreeLayout(ctx, g)
+    finally:
+        cgraph.agclose(g)
+
+
+def _write_frame(out, status: bytes, payload: bytes):
+    out.write(status + _LEN.pack(len(payload)) + payload)
+    out.flush()
+
+
+def _read_frame(inp) -> bytes:
+    head = inp.read(_LEN.size)
+    if len(head) < _LEN.size:
+        raise EOFError
+    return inp.read(_LEN.unpack(head)[0])
+
+
+def serve(inp=None, out=None):
+    inp = inp or sys.stdin.buffer
+    out = out or sys.stdout.buffer
+    errors = []
+    try:
+        lib = _load_graphviz()
+        # collect Graphviz error text instead of letting it go to stderr
+        handler = ctypes.CFUNCTYPE(ctypes.c_int, ctypes.c_char_p)(
+            lambda msg: errors.append(msg.decode("utf-8", "replace")) or 0)
+        if hasattr(lib[1], "agseterrf"):
+            lib[1].agseterrf(handler)
+    except OSError as e:
+        _write_frame(out, b"E", str(e).encode())
+        return
+    _write_frame(out, b"R", b"")
+    while True:
+        try:
+            header = json.loads(_read_frame(inp))
+            dot = _read_frame(inp)
+        except EOFError:
+            return
+        try:
+            _write_frame(out, b"O", _render(lib, errors, dot, header["fmt"], header.get("engine", "dot")))
+        except WorkerError as e:
+            _write_frame(out, b"E", str(e).encode())
+
+
+# ---- parent side ----
+def _rss_bytes(pid: int) -> int:
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+class _Worker:
+    def __init__(self, start_timeout: float):
+        self.proc = subprocess.Popen([sys.executable, os.path.abspath(__file__)],
+                                     stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        self.jobs = 0
+        try:
+            status, payload = self.read(time.monotonic() + start_timeout)
+        except (WorkerError, OSError) as e:  # TimeoutError included
+            self.kill()
+            raise WorkerUnavailable(f"worker failed to start: {str(e) or 'timed out'}") from e
+        if status != b"R":
+            self.kill()
+            raise WorkerUnavailable(payload.decode("utf-8", "replace") or "worker failed to start")
+
+    def _read_exact(self, n: int, deadline: float) -> bytes:
+        fd = self.proc.stdout.fileno()
+        chunks, remaining = [], n
+        while remaining:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0 or not select.select([fd], [], [], timeout)[0]:
+                raise TimeoutError
+            chunk = os.read(fd, min(remaining, 1 << 20))
+            if not chunk:
+                raise WorkerError("worker exited")
+            chunks.append(chunk)
+            remaining -= len(chunk)
+        return b"".join(chunks)
+
+    def read(self, deadline: float):
+        status = self._read_exact(1, deadline)
+        length = _LEN.unpack(self._read_exact(_LEN.size, deadline))[0]
+        return status, self._read_exact(length, deadline)
+
+    def send(self, dot_source: str, fmt: str, engine: str):
+        header = json.dumps({"fmt": fmt, "engine": engine}).encode()
+        dot = dot_source.encode("utf-8")
+        self.proc.stdin.write(_LEN.pack(len(header)) + header + _LEN.pack(len(dot)) + dot)
+        self.proc.stdin.flush()
+
+    def rss(self) -> int:
+        return _rss_bytes(self.proc.pid)
+
+    def kill(self):
+        if self.proc.poll() is None:
+            self.proc.kill()
+        self.proc.wait()
+        for f in (self.proc.stdin, self.proc.stdout):
+            try:
+                f.close()
+            except OSError:
+                pass
+
+
+class GraphvizWorkerPool:
+    name = "warm"
+
+    def __init__(self, size: int = 2, job_timeout: float = 60.0, max_jobs: int = 500,
+                 max_rss_mb: int = 512, start_timeout: float = 10.0):
+        self.size = size
+        self.job_timeout = job_timeout
+        self.max_jobs = max_jobs
+        self.max_rss = max_rss_mb * 1024 * 1024
+        self.start_timeout = start_timeout
+        self._idle = queue.LifoQueue()  # most recently used first: warmest caches
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._available = None
+        self._closed = False
+        self.stats = dict(jobs=0, spawned=0, recycled=0, timeouts=0, crashes=0)
+
+    def _spawn(self) -> _Worker:
+        w = _Worker(self.start_timeout)
+        with self._lock:
+            self.stats["spawned"] += 1
+        return w
+
+    def start(self):
+        # pre-fork the whole pool; also tells us whether libgvc is usable here
+        with self._lock:
+            if self._available is not None:
+                return self
+            workers = []
+            try:
+                for _ in range(self.size):
+                    workers.append(_Worker(self.start_timeout))
+            except (WorkerError, OSError):
+                for w in workers:
+                    w.kill()
+                self._available = False
+                return self
+            self.stats["spawned"] += len(workers)
+            for w in workers:
+                self._idle.put(w)
+            self._available = True
+        return self
+
+    def available(self) -> bool:
+        if self._available is None:
+            self.start()
+        return self._available and not self._closed
+
+    def _retire(self, w: _Worker, reason: str):
+        w.kill()
+        with self._lock:
+            self.stats[reason] += 1
+
+    def render(self, dot_source: str, fmt: str, engine: str = "dot") -> bytes:
+        # raises WorkerError for Graphviz errors and timeouts, WorkerUnavailable
+        # when no worker could run the job
+        if not self.available():
+            raise WorkerUnavailable("Graphviz worker pool is not available.")
+        with self._slots:
+            try:
+                w = self._idle.get_nowait()
+            except queue.Empty:
+                try:
+                    w = self._spawn()  # replaces a retired worker
+                except (WorkerError, OSError) as e:
+                    raise WorkerUnavailable(f"could not start a Graphviz worker: {e}") from e
+            try:
+                w.send(dot_source, fmt, engine)
+                status, payload = w.read(time.monotonic() + self.job_timeout)
+            except TimeoutError:
+                self._retire(w, "timeouts")
+                raise WorkerError(f"render timed out after {self.job_timeout:.0f}s") from None
+            except (WorkerError, OSError) as e:
+                self._retire(w, "crashes")
+                raise WorkerUnavailable(f"Graphviz worker died: {e}") from e
+            w.jobs += 1
+            with self._lock:
+                self.stats["jobs"] += 1
+            if w.jobs >= self.max_jobs or (self.max_rss and w.rss() > self.max_rss):
+                self._retire(w, "recycled")
+            else:
+                self._idle.put(w)
+        if status != b"O":
+            raise WorkerError(payload.decode("utf-8", "replace")[:200])
+        return payload
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().kill()
+            except queue.Empty:
+                break
+
+
+if __name__ == "__main__":
+    serve()
@@ -0,0 +1,76 @@
+import json
+import re
+
+from component_layout import with_graph_attrs
+from renderers import RenderError
+
+# --------------------------
+# Incremental Layout
+# --------------------------
+# A full layout is kept as node coordinates (points, from -Tjson). When the
+# next version of the graph only adds a few nodes, the known nodes are pinned
+# where they were (pos="x,y!") and neato places just the new ones; with no
+# new nodes at all, the nop engine (neato -n) only routes the edges. Either
+# way the picture stays put and large graphs skip most of the layout work.
+# Every layout goes through positioned DOT (-Tdot), which the nop2 engine then
+# draws and reports coordinates for without laying out again. A backend that
+# only returns finished images (the remote /render service) gets a plain
+# render instead, and no positions are kept.
+
+# an edit is small if it adds at most max(MAX_NEW, MAX_NEW_FRACTION * nodes) nodes
+# and removes at most as many of the old ones
+MAX_NEW = 5
+MAX_NEW_FRACTION = 0.1
+_NODE_LINE = re.compile(r'^\t+("(?:[^"\\]|\\.)*"|[\w.]+) \[', re.M)
+_KEYWORDS = {"graph", "node", "edge"}
+
+
+def node_names(dot_source: str) -> set:
+    # node ids declared in build_graph output (edge lines have "->" after the first id)
+    names = set()
+    for name in _NODE_LINE.findall(dot_source):
+        if name.startswith('"'):
+            name = name[1:-1].replace('\\"', '"')
+        elif name in _KEYWORDS:
+            continue
+        names.add(name)
+    return names
+
+
+def node_positions(layout_json: bytes) -> dict:
+    # node name -> "x,y" in points
+    doc = json.loads(layout_json)
+    return {o["name"]: o["pos"] for o in doc.get("objects", []) if "pos" in o and "nodes" not in o}
+
+
+def pinned_source(dot_source: str, positions: dict, names) -> str:
+    # known nodes pinned at their old coordinates; the header comment is renamed
+    # so these quick layouts are not timed as full ones (LayoutTimings)
+    known = [n for n in names if n in positions]
+    pins = "".join('\t"{}" [pos="{}!"]\n'.format(n.replace('"', '\\"'), positions[n]) for n in known)
+    body, brace, tail = dot_source.replace("// layout", "// pinned", 1).rpartition("}")
+    if len(known) == len(names):
+        return with_graph_attrs(body + pins + brace + tail, layout="nop")
+    return with_graph_attrs(body + pins + brace + tail, layout="neato", inputscale="72", overlap="false")
+
+
+def render_with_positions(dot_source: str, fmt: str, render, positions: dict = None, full_render=None) -> tuple:
+    # (rendered bytes, new positions or None, "incremental" or "full");
+    # `full_render` lays out from scratch (default `render`)
+    names = node_names(dot_source)
+    new = [n for n in names if n not in (positions or {})]
+    gone = [n for n in positions or () if n not in names]
+    small = (positions and len(new) < len(names) and len(new) <= max(MAX_NEW, MAX_NEW_FRACTION * len(names))
+             and len(gone) <= max(MAX_NEW, MAX_NEW_FRACTION * len(positions)))
+    try:
+        if small:
+            positioned = render(pinned_source(dot_source, positions, names), "dot").decode("utf-8")
+        else:
+            positioned = (full_render or render)(dot_source, "dot").decode("utf-8")
+        drawn = with_graph_attrs(positioned, layout="nop2")
+        layout_json = render(drawn, "json")
+    except RenderError:
+        # no "dot" / "json" output from this backend (or bad DOT, which the
+        # plain render reports)
+        return render(dot_source, fmt), None, "full"
+    return render(drawn, fmt), node_positions(layout_json), "incremental" if small else "full"
@@ -0,0 +1,157 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+# --------------------------
+# Render Result Cache
+# --------------------------
+# Rendered diagrams keyed by (DOT hash, format, engine). Two tiers: an
+# in-memory LRU bounded by total bytes, and an optional directory that
+# survives restarts. Identical renders requested at the same time (e.g. from
+# several sessions) share one in-flight call.
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_DISK_MAX_BYTES = 512 * 1024 * 1024
+
+
+def render_key(dot_source: str, fmt: str, engine: str = "dot") -> str:
+    digest = hashlib.sha256(dot_source.encode("utf-8")).hexdigest()
+    return f"{digest}.{engine}.{fmt}"
+
+
+class RenderCache:
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES, disk_dir: str = None,
+                 disk_max_bytes: int = DEFAULT_DISK_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self._lock = threading.Lock()
+        self._mem = OrderedDict()  # key -> bytes, least recently used first
+        self._mem_bytes = 0
+        self._inflight = {}        # key -> Future shared by concurrent callers
+        self.stats = dict(hits=0, disk_hits=0, misses=0, joined=0, evictions=0)
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    # ---- memory tier ----
+    def _mem_get(self, key):
+        data = self._mem.get(key)
+        if data is not None:
+            self._mem.move_to_end(key)
+        return data
+
+    def _mem_put(self, key, data: bytes):
+        if len(data) > self.max_bytes:
+            return
+        old = self._mem.pop(key, None)
+        if old is not None:
+            self._mem_bytes -= len(old)
+        self._mem[key] = data
+        self._mem_bytes += len(data)
+        while self._mem_bytes > self.max_bytes:
+            _, evicted = self._mem.popitem(last=False)
+            self._mem_bytes -= len(evicted)
+            self.stats["evictions"] += 1
+
+    # ---- disk tier ----
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, key)
+
+    def _disk_get(self, key):
+        if not self.disk_dir:
+            return None
+        try:
+            with open(self._disk_path(key), "rb") as f:
+                data = f.read()
+            os.utime(self._disk_path(key))  # mtime doubles as last use for eviction
+            return data
+        except OSError:
+            return None
+
+    def _disk_put(self, key, data: bytes):
+        if not self.disk_dir:
+            return
+        tmp = self._disk_path(key) + f".{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, self._disk_path(key))
+            self._disk_trim()
+        except OSError:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+
+    def _disk_trim(self):
+        entries = []
+        with os.scandir(self.disk_dir) as it:
+            for d in it:
+                if d.is_file() and not d.name.endswith(".tmp"):
+                    st = d.stat()
+                    entries.append((st.st_mtime, st.st_size, d.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.disk_max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+    # ---- public ----
+    def get(self, key):
+        with self._lock:
+            data = self._mem_get(key)
+        if data is not None:
+            self.stats["hits"] += 1
+            return data
+        data = self._disk_get(key)
+        if data is not None:
+            self.stats["disk_hits"] += 1
+            with self._lock:
+                self._mem_put(key, data)
+        return data
+
+    def put(self, key, data: bytes):
+        with self._lock:
+            self._mem_put(key, data)
+        self._disk_put(key, data)
+
+    def get_or_render(self, dot_source: str, fmt: str, engine: str, render_fn) -> bytes:
+        # render_fn() is called at most once per key at a time; errors are not cached
+        key = render_key(dot_source, fmt, engine)
+        data = self.get(key)
+        if data is not None:
+            return data
+        with self._lock:
+            data = self._mem_get(key)  # finished while we were checking the disk
+            if data is not None:
+                return data
+            fut = self._inflight.get(key)
+            leader = fut is None
+            if leader:
+                fut = self._inflight[key] = Future()
+        if not leader:
+            self.stats["joined"] += 1
+            return fut.result()
+        self.stats["misses"] += 1
+        try:
+            data = render_fn()
+            self.put(key, data)
+            fut.set_result(data)
+            return data
+        except BaseException as e:
+            fut.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._mem.clear()
+            self._mem_bytes = 0
@@ -0,0 +1,233 @@
+import argparse
+import json
+import os
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from export_jobs import EXPORT_FORMATS
+from gv_pool import GraphvizWorkerPool
+from render_cache import DEFAULT_MAX_BYTES, RenderCache, render_key
+from renderers import AutoRenderer, BackendUnavailable, LocalRenderer, RenderError, WarmRenderer
+
+# --------------------------
+# Self-hosted Render Service
+# --------------------------
+# Implements the contract the app's RemoteRenderClient speaks:
+#   POST /render  {"dot": "...", "format": "png|pdf|svg"}  -> rendered bytes
+# (optionally gzip-encoded request body), plus GET /metrics (Prometheus text)
+# and GET /healthz. Renders run on the warm worker pool (or `dot` per render
+# when libgvc is missing), results go through a RenderCache, and at most
+# `workers + queue` uncached renders are admitted; the rest get 503 with
+# Retry-After so clients back off instead of piling up.
+#
+#   python render_server.py --port 8000
+#   GRAPHVIZ_API_URL=http://127.0.0.1:8000 streamlit run family_structure_app_v1_6_8a.py
+
+MAX_BODY_BYTES = 32 * 1024 * 1024
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+class BadRequest(Exception):
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = {}  # (format, status code) -> count
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.latency_sum = 0.0
+        self.latency_count = 0
+
+    def observe(self, fmt: str, code: int, seconds: float):
+        with self._lock:
+            self.requests[(fmt, code)] = self.requests.get((fmt, code), 0) + 1
+            if code == 200:
+                for i, le in enumerate(LATENCY_BUCKETS):
+                    if seconds <= le:
+                        self.buckets[i] += 1
+                self.latency_sum += seconds
+                self.latency_count += 1
+
+    def render(self, server) -> str:
+        lines = ["# TYPE render_requests_total counter"]
+        with self._lock:
+            for (fmt, code), n in sorted(self.requests.items()):
+                lines.append(f'render_requests_total{{format="{fmt}",code="{code}"}} {n}')
+            lines.append("# TYPE render_duration_seconds histogram")
+            for le, n in zip(LATENCY_BUCKETS, self.buckets):
+                lines.append(f'render_duration_seconds_bucket{{le="{le}"}} {n}')
+            lines.append(f'render_duration_seconds_bucket{{le="+Inf"}} {self.latency_count}')
+            lines.append(f"render_duration_seconds_sum {self.latency_sum:.6f}")
+            lines.append(f"render_duration_seconds_count {self.latency_count}")
+        lines += ["# TYPE render_inflight gauge", f"render_inflight {server.inflight}",
+                  "# TYPE render_admission_limit gauge", f"render_admission_limit {server.admission_limit}"]
+        for name, n in server.cache.stats.items():
+            lines.append(f'render_cache_total{{result="{name}"}} {n}')
+        for name, n in server.pool.stats.items():
+            lines.append(f'render_worker_total{{event="{name}"}} {n}')
+        return "\n".join(lines) + "\n"
+
+
+class RenderServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, workers: int = 2, queue: int = 16, cache: RenderCache = None,
+                 job_timeout: float = 60.0, retry_after: int = 2):
+        super().__init__(address, RenderHandler)
+        self.pool = GraphvizWorkerPool(size=workers, job_timeout=job_timeout).start()
+        self.renderer = AutoRenderer([WarmRenderer(self.pool), LocalRenderer(timeout=job_timeout)])
+        self.cache = cache or RenderCache()
+        self.metrics = Metrics()
+        self.admission_limit = workers + queue
+        self.retry_after = retry_after
+        self.inflight = 0
+        self._lock = threading.Lock()
+
+    def admit(self) -> bool:
+        with self._lock:
+            if self.inflight >= self.admission_limit:
+                return False
+            self.inflight += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self.inflight -= 1
+
+    def server_close(self):
+        super().server_close()
+        self.pool.close()
+
+
+class RenderHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive for the client's pooled session
+
+    def log_message(self, fmt, *args):
+        pass  # request counts are in /metrics
+
+    def _send(self, code: int, body: bytes, content_type: str = "text/plain; charset=utf-8", headers=None):
+        self.send_response(code)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        if self.close_connection:
+            self.send_header("Connection", "close")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/metrics":
+            self._send(200, self.server.metrics.render(self.server).encode(), "text/plain; version=0.0.4")
+        elif self.path == "/healthz":
+            ok = self.server.renderer.available()
+            self._send(200 if ok else 503, b"ok\n" if ok else b"no Graphviz backend\n")
+        else:
+            self._send(404, b"not found\n")
+
+    def _read_request(self):
+        # a body we refuse to read is left on the socket, so those replies
+        # also close the connection rather than parse it as the next request
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            self.close_connection = True
+            raise BadRequest(400, "invalid Content-Length")
+        if length > MAX_BODY_BYTES:
+            self.close_connection = True
+            raise BadRequest(413, "request body too large")
+        body = self.rfile.read(length)
+        encoding = self.headers.get("Content-Encoding", "identity").lower()
+        if encoding == "gzip":
+            try:
+                # bounded, so a small gzip bomb cannot expand without limit
+                body = zlib.decompressobj(16 + zlib.MAX_WBITS).decompress(body, MAX_BODY_BYTES + 1)
+            except zlib.error:
+                raise BadRequest(400, "invalid gzip body")
+            if len(body) > MAX_BODY_BYTES:
+                raise BadRequest(413, "request body too large")
+        elif encoding != "identity":
+            raise BadRequest(415, f"unsupported Content-Encoding {encoding}")
+        try:
+            req = json.loads(body)
+            dot, fmt = req["dot"], req.get("format", "png")
+        except (ValueError, KeyError, TypeError):
+            raise BadRequest(400, 'expected JSON {"dot": ..., "format": ...}')
+        if not isinstance(dot, str) or fmt not in EXPORT_FORMATS:
+            raise BadRequest(400, f"format must be one of {', '.join(EXPORT_FORMATS)}")
+        return dot, fmt
+
+    def do_POST(self):
+        if self.path != "/render":
+            self._send(404, b"not found\n")
+            return
+        t0 = time.monotonic()
+        fmt = "-"
+        try:
+            dot, fmt = self._read_request()
+        except BadRequest as e:
+            self._respond(fmt, t0, e.code, f"{e}\n".encode())
+            return
+        srv = self.server
+        data = srv.cache.get(render_key(dot, fmt))
+        if data is None:
+            if not srv.renderer.available():
+                self._respond(fmt, t0, 503, b"no Graphviz backend available\n")
+                return
+            if not srv.admit():
+                self._respond(fmt, t0, 503, b"renderer busy, retry later\n",
+                              headers={"Retry-After": str(srv.retry_after)})
+                return
+            try:
+                data = srv.cache.get_or_render(dot, fmt, "dot", lambda: srv.renderer.render(dot, fmt))
+            except BackendUnavailable as e:
+                # a worker died or no backend could run: the same request may work later
+                self._respond(fmt, t0, 503, (str(e)[:500] + "\n").encode(),
+                              headers={"Retry-After": str(srv.retry_after)})
+                return
+            except RenderError as e:
+                # bad DOT or a timed-out render: retrying will not help, so not a 5xx
+                self._respond(fmt, t0, 422, (str(e)[:500] + "\n").encode())
+                return
+            finally:
+                srv.release()
+        self._respond(fmt, t0, 200, data, EXPORT_FORMATS[fmt]["mime"])
+
+    def _respond(self, fmt, t0, code, body, content_type="text/plain; charset=utf-8", headers=None):
+        self._send(code, body, content_type, headers)
+        self.server.metrics.observe(fmt, code, time.monotonic() - t0)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Graphviz /render service")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8000)
+    ap.add_argument("--workers", type=int, default=int(os.environ.get("GRAPHVIZ_WORKERS", 2)))
+    ap.add_argument("--queue", type=int, default=16, help="uncached renders allowed to wait for a worker")
+    ap.add_argument("--timeout", type=float, default=60.0, help="per-render timeout in seconds")
+    ap.add_argument("--cache-mb", type=int, default=int(os.environ.get("RENDER_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES)) >> 20)
+    ap.add_argument("--cache-dir", default=os.environ.get("RENDER_CACHE_DIR") or None)
+    args = ap.parse_args()
+
+    cache = RenderCache(max_bytes=args.cache_mb << 20, disk_dir=args.cache_dir)
+    server = RenderServer((args.host, args.port), workers=args.workers, queue=args.queue,
+                          cache=cache, job_timeout=args.timeout)
+    backends = [b.name for b in server.renderer.backends if b.available()]
+    print(f"Rendering on http://{args.host}:{args.port}/render with {', '.join(backends) or 'no Graphviz backend'}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+import gzip
+import json
+import shutil
+import subprocess
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from export_jobs import EXPORT_FORMATS
+from gv_pool import GraphvizWorkerPool, WorkerError, WorkerUnavailable
+
+# --------------------------
+# Diagram Renderers
+# --------------------------
+
+
+class RenderError(Exception):
+    pass
+
+
+class BackendUnavailable(RenderError):
+    # the backend failed rather than the DOT (missing, crashed, unreachable,
+    # 5xx), so the same render may succeed later or elsewhere
+    pass
+
+
+class RemoteRenderClient:
+    # Client for a renderer exposing POST /render {"dot", "format"} -> bytes.
+    # Keeps a pooled keep-alive session, gzips large request bodies, uses
+    # separate connect/read timeouts and retries 5xx and connection failures
+    # with exponential backoff. Read timeouts are not retried: a render that
+    # ran out of time would most likely do so again.
+    def __init__(self, base_url: str, connect_timeout: float = 5.0, read_timeout: float = 60.0,
+                 retries: int = 3, backoff: float = 0.5, gzip_min_bytes: int = 16 * 1024,
+                 pool_size: int = 8):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = (connect_timeout, read_timeout)
+        self.gzip_min_bytes = gzip_min_bytes
+        self.gzip_ok = True  # cleared if the server turns out not to accept gzip bodies
+        retry = Retry(
+            total=retries, connect=retries, read=0, status=retries, other=0,
+            backoff_factor=backoff, status_forcelist=(500, 502, 503, 504),
+            allowed_methods=None,  # rendering is idempotent, so POST may be retried
+            raise_on_status=False, respect_retry_after_header=True,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _post(self, body: bytes, compress: bool):
+        headers = {"Content-Type": "application/json"}
+        if compress:
+            body = gzip.compress(body, compresslevel=6)
+            headers["Content-Encoding"] = "gzip"
+        return self.session.post(self.base_url + "/render", data=body, headers=headers, timeout=self.timeout)
+
+    def render(self, dot_source: str, fmt: str) -> bytes:
+        body = json.dumps({"dot": dot_source, "format": fmt}).encode("utf-8")
+        compress = self.gzip_ok and len(body) >= self.gzip_min_bytes
+        try:
+            resp = self._post(body, compress)
+            if compress and resp.status_code in (400, 415):
+                # older renderers reject Content-Encoding; retry plain and remember
+                plain = self._post(body, False)
+                if plain.status_code == 200:
+                    self.gzip_ok = False
+                resp = plain
+        except requests.RequestException as e:
+            raise BackendUnavailable(f"Remote render error: {e}") from e
+        if resp.status_code != 200:
+            error = BackendUnavailable if resp.status_code >= 500 else RenderError
+            raise error(f"Remote render failed: HTTP {resp.status_code} - {resp.text[:200]}")
+        return resp.content
+
+    def close(self):
+        self.session.close()
+
+
+# --------------------------
+# Pluggable Backends
+# --------------------------
+# Every backend has a name, available() and render(dot_source, fmt) -> bytes,
+# raising RenderError on failure.
+
+
+class LocalRenderer:
+    name = "local"
+
+    def __init__(self, binary: str = "dot", timeout: float = 60.0):
+        self.binary = shutil.which(binary)
+        self.timeout = timeout
+
+    def available(self) -> bool:
+        return self.binary is not None
+
+    def render(self, dot_source: str, fmt: str) -> bytes:
+        if not self.binary:
+            raise BackendUnavailable("Graphviz 'dot' executable not found.")
+        try:
+            proc = subprocess.run([self.binary, f"-T{fmt}"], input=dot_source.encode("utf-8"),
+                                  capture_output=True, timeout=self.timeout)
+        except subprocess.TimeoutExpired as e:
+            raise RenderError(f"Local render timed out after {self.timeout:.0f}s") from e
+        except OSError as e:
+            raise BackendUnavailable(f"Local render error: {e}") from e
+        if proc.returncode < 0:  # killed by a signal, not a DOT error
+            raise BackendUnavailable(f"Local render killed by signal {-proc.returncode}")
+        if proc.returncode != 0:
+            raise RenderError(f"Local render failed: {proc.stderr.decode('utf-8', 'replace')[:200]}")
+        return proc.stdout
+
+
+class WarmRenderer:
+    # Renders on a pool of long-lived Graphviz workers (see gv_pool.py); only
+    # available where libgvc can be loaded.
+    name = "warm"
+
+    def __init__(self, pool: GraphvizWorkerPool):
+        self.pool = pool
+
+    def available(self) -> bool:
+        return self.pool.available()
+
+    def render(self, dot_source: str, fmt: str) -> bytes:
+        try:
+            return self.pool.render(dot_source, fmt)
+        except WorkerUnavailable as e:
+            raise BackendUnavailable(f"Warm render failed: {e}") from e
+        except WorkerError as e:
+            raise RenderError(f"Warm render failed: {e}") from e
+
+
+class RemoteRenderer:
+    name = "remote"
+    formats = tuple(EXPORT_FORMATS)  # the /render contract; Graphviz backends take any -T format
+
+    def __init__(self, client: RemoteRenderClient):
+        self.client = client
+
+    def available(self) -> bool:
+        return bool(self.client.base_url)
+
+    def render(self, dot_source: str, fmt: str) -> bytes:
+        return self.client.render(dot_source, fmt)
+
+
+class AutoRenderer:
+    # Tries available backends fastest-first by measured latency (an EWMA per
+    # backend; unmeasured backends follow in their given order) and falls through to
+    # the next one when a backend is unavailable (BackendUnavailable), which then
+    # sits out for `cooldown` seconds. Any other RenderError (bad DOT, a timeout)
+    # would fail the same way elsewhere, so it is raised straight away.
+    def __init__(self, backends, alpha: float = 0.3, cooldown: float = 30.0):
+        self.backends = list(backends)
+        self.alpha = alpha
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._latency = {}     # backend name -> EWMA seconds
+        self._down_until = {}  # backend name -> monotonic time
+        self.last_used = None
+
+    def order(self, fmt: str = None) -> list:
+        # backends able to render `fmt` (all if None), best first
+        now = time.monotonic()
+        live = [b for b in self.backends if b.available() and (fmt is None or fmt in getattr(b, "formats", (fmt,)))]
+        with self._lock:
+            up = [b for b in live if self._down_until.get(b.name, 0) <= now]
+            rank = {b.name: (self._latency.get(b.name, float("inf")), i) for i, b in enumerate(self.backends)}
+        # a cooling-down backend is still tried last rather than never
+        return sorted(up, key=lambda b: rank[b.name]) + [b for b in live if b not in up]
+
+    def available(self) -> bool:
+        return any(b.available() for b in self.backends)
+
+    def render(self, dot_source: str, fmt: str) -> bytes:
+        errors = []
+        for backend in self.order(fmt):
+            t0 = time.monotonic()
+            try:
+                data = backend.render(dot_source, fmt)
+            except BackendUnavailable as e:
+                errors.append(f"{backend.name}: {e}")
+                with self._lock:
+                    self._down_until[backend.name] = time.monotonic() + self.cooldown
+                continue
+            self._record(backend.name, time.monotonic() - t0)
+            self.last_used = backend.name
+            return data
+        if not errors and self.available():
+            raise RenderError(f"No available renderer produces {fmt}: that needs Graphviz installed locally.")
+        if not errors:
+            raise BackendUnavailable("No renderer available: install Graphviz locally or set a Graphviz API URL.")
+        raise BackendUnavailable("; ".join(errors))
+
+    def _record(self, name: str, seconds: float):
+        with self._lock:
+            prev = self._latency.get(name)
+            self._latency[name] = seconds if prev is None else self.alpha * seconds + (1 - self.alpha) * prev
+            self._down_until.pop(name, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {b.name: dict(available=b.available(), latency=self._latency.get(b.name),
+                                 cooling_down=self._down_until.get(b.name, 0) > time.monotonic())
+                    for b in self.backends}
@@ -0,0 +1,228 @@
+import bisect
+import re
+
+# --------------------------
+# Entity Search Index
+# --------------------------
+# Token index over name, ABN / ACN / TFN and custom fields, for pickers and the
+# global search box. Prefix lookups use a sorted token list (a flat trie: all
+# tokens with a given prefix sit in one bisect range); typo-tolerant lookups
+# use character bigrams of the text tokens. Kept in step with an EntityStore
+# through its per-entity versions, like the DOT fragment cache.
+
+ID_FIELDS = ["ABN", "ACN", "TFN"]
+MIN_FUZZY = 0.5    # Dice similarity needed for a fuzzy token match
+_WORD = re.compile(r"[^\W_]+")
+_ID_QUERY = re.compile(r"[\d\s-]+")
+
+
+def tokens(text: str) -> list:
+    return _WORD.findall(str(text).lower())
+
+
+def id_token(value: str) -> str:
+    # "51 824 753 556" and "51-824-753-556" both index as "51824753556"
+    return re.sub(r"\D", "", str(value))
+
+
+def bigrams(token: str) -> set:
+    # bigrams rather than trigrams so short-word transpositions still match
+    # ("smtih" shares half its bigrams with "smith", but one trigram)
+    padded = f" {token} "
+    return {padded[i:i + 2] for i in range(len(padded) - 1)}
+
+
+class SearchIndex:
+    def __init__(self):
+        self._sorted = []     # every indexed token, sorted, for prefix ranges
+        self._postings = {}   # token -> {entity id: None} (insertion ordered)
+        self._grams = {}      # bigram -> {text token}
+        self._by_id = {}      # entity id -> (name tokens, all tokens)
+        self._store_key = None
+        self._fields = ()     # custom fields indexed so far
+        self._store_rev = -1
+        self._bulk = False    # while set, new tokens are appended and sorted once at the end
+
+    def __len__(self):
+        return len(self._by_id)
+
+    # ---- maintenance ----
+    def _add_token(self, tok, eid):
+        posting = self._postings.get(tok)
+        if posting is None:
+            posting = self._postings[tok] = {}
+            if self._bulk:
+                self._sorted.append(tok)
+            else:
+                bisect.insort(self._sorted, tok)
+            if not tok.isdigit():  # fuzzy matching identifiers is meaningless
+                for g in bigrams(tok):
+                    self._grams.setdefault(g, set()).add(tok)
+        posting[eid] = None
+
+    def _drop_token(self, tok, eid):
+        posting = self._postings.get(tok)
+        if posting is None:
+            return
+        posting.pop(eid, None)
+        if posting:
+            return
+        del self._postings[tok]
+        del self._sorted[bisect.bisect_left(self._sorted, tok)]
+        if not tok.isdigit():
+            for g in bigrams(tok):
+                toks = self._grams.get(g)
+                if toks is not None:
+                    toks.discard(tok)
+                    if not toks:
+                        del self._grams[g]
+
+    def add(self, e: dict, fields):
+        self.remove(e["id"])
+        name_toks = set(tokens(e.get("name", "")))
+        all_toks = set(name_toks)
+        for f in fields:
+            val = e.get(f, "")
+            if not val:
+                continue
+            if f in ID_FIELDS and id_token(val):
+                all_toks.add(id_token(val))
+            else:
+                all_toks.update(tokens(val))
+        for tok in all_toks:
+            self._add_token(tok, e["id"])
+        self._by_id[e["id"]] = (name_toks, all_toks)
+
+    def remove(self, eid: str):
+        entry = self._by_id.pop(eid, None)
+        if entry is not None:
+            for tok in entry[1]:
+                self._drop_token(tok, eid)
+
+    def clear(self):
+        self.__init__()
+
+    def sync(self, store) -> int:
+        # re-index entities changed since the last sync and drop deleted ones.
+        # A new custom field is empty until entities are edited (which re-indexes
+        # them); dropping one means a full rebuild
+        fields = tuple(store.custom_fields)
+        if id(store) != self._store_key or not set(self._fields) <= set(fields):
+            self.clear()
+            self._store_key = id(store)
+        self._fields = fields
+        if store.revision == self._store_rev:
+            return 0
+        for eid in store.removed_since(self._store_rev):
+            self.remove(eid)
+        changed = store.changed_since(self._store_rev)
+        if changed:
+            fields = ID_FIELDS + store.custom_fields
+            self._bulk = len(changed) > 1000
+            for e in store.rows(changed):
+                self.add(e, fields)
+            if self._bulk:
+                self._sorted.sort()
+                self._bulk = False
+        self._store_rev = store.revision
+        return len(changed)
+
+    # ---- lookups ----
+    def _prefix(self, term: str) -> list:
+        lo = bisect.bisect_left(self._sorted, term)
+        hi = bisect.bisect_left(self._sorted, term + "\uffff")
+        return self._sorted[lo:hi]
+
+    def _fuzzy(self, term: str) -> dict:
+        # text tokens sharing enough bigrams with `term` -> Dice similarity
+        grams = bigrams(term)
+        counts = {}
+        for g in grams:
+            for tok in self._grams.get(g, ()):
+                counts[tok] = counts.get(tok, 0) + 1
+        out = {}
+        for tok, shared in counts.items():
+            score = 2 * shared / (len(grams) + len(tok) + 1)  # a padded token has len + 1 bigrams
+            if score >= MIN_FUZZY:
+                out[tok] = score
+        return out
+
+    def search(self, query: str, limit: int = 20) -> list:
+        # ids matching every query term, best first: exact > prefix > fuzzy,
+        # name hits above identifier / custom field hits. Fuzzy matching only
+        # runs when exact and prefix matches don't fill `limit`.
+        if _ID_QUERY.fullmatch(query.strip() or "x"):
+            terms = [id_token(query)]  # a spaced-out ABN / ACN / TFN is one identifier
+        else:
+            terms = tokens(query)
+        if not terms:
+            return []
+        found = self._search(terms, limit, fuzzy=False)
+        if len(found) < limit:
+            seen = set(found)
+            found += [eid for eid in self._search(terms, limit, fuzzy=True) if eid not in seen][:limit - len(found)]
+        return found
+
+    def _search(self, terms, limit, fuzzy) -> list:
+        fuzzies = [self._fuzzy(t) if fuzzy and len(t) >= 3 and not t.isdigit() else {} for t in terms]
+        # prefix tokens first (sorted, so an exact token leads), then fuzzy ones, closest first
+        matched = [self._prefix(t) + sorted((tok for tok in f if not tok.startswith(t)), key=f.get, reverse=True)
+                   for t, f in zip(terms, fuzzies)]
+        if any(not toks for toks in matched):
+            return []
+        # candidates: intersect the postings of the selective terms (few matching
+        # tokens) as sets, the last one only until there are enough to score;
+        # single-term queries and queries with no selective term stream candidates
+        # from their narrowest term instead. Either way at most `scan` candidates
+        # are scored, which bounds the cost of one-letter queries.
+        size = [len(toks) if len(toks) > 64 else sum(len(self._postings[t]) for t in toks) for toks in matched]
+        order = sorted(range(len(terms)), key=lambda i: (len(matched[i]) > 64, size[i]))
+        scan = max(limit * 10, 100)
+        candidates = None
+        broad = [i for i in order if len(matched[i]) > 64 or len(terms) == 1]
+        selective = [i for i in order if i not in broad]
+        for i in selective:
+            ids = set()
+            for tok in matched[i]:
+                if candidates is None:
+                    ids.update(self._postings[tok])
+                else:  # keys-view & set walks the smaller side
+                    ids |= self._postings[tok].keys() & candidates
+                    if i == selective[-1] and len(ids) >= scan:
+                        break  # only `scan` get scored; the range starts with the closest tokens
+            candidates = ids
+        if candidates is None:
+            # prefix ranges start with the exact token, so exact hits come first
+            narrowest = matched[order[0]]
+            candidates = (eid for tok in narrowest for eid in self._postings[tok])
+        elif len(candidates) > scan:
+            # score exact hits on the broad terms before the capped scan runs out
+            exact = [eid for i in broad for eid in self._postings.get(terms[i], ()) if eid in candidates]
+            candidates = exact + list(candidates)
+        scored = {}
+        for eid in candidates:
+            if eid not in scored:
+                scored[eid] = self._score(eid, terms, fuzzies)
+                if len(scored) >= scan:
+                    break
+        hits = [eid for eid in scored if scored[eid]]
+        return sorted(hits, key=scored.get, reverse=True)[:limit]
+
+    def _score(self, eid, terms, fuzzies) -> float:
+        # per term the best token: exact 1.0, prefix 0.8, fuzzy below 0.6; name
+        # tokens count 1.5x; 0 if any term is unmatched
+        name_toks, all_toks = self._by_id[eid]
+        total = 0.0
+        for term, fz in zip(terms, fuzzies):
+            if term in name_toks:  # the best any token can do
+                total += 1.5
+                continue
+            best = 0.0
+            for tok in all_toks:
+                q = 1.0 if tok == term else 0.8 if tok.startswith(term) else 0.6 * fz.get(tok, 0.0)
+                if q:
+                    best = max(best, q * (1.5 if tok in name_toks else 1.0))
+            if not best:
+                return 0.0
+            total += best
+        return total
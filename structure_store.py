@@ -0,0 +1,439 @@
+import uuid
+
+import pandas as pd
+
+BASE_FIELDS = ["id", "name", "type", "address", "TFN", "ABN", "ACN"]
+
+# --------------------------
+# Entity Store
+# --------------------------
+# Entities are held column-wise in a DataFrame indexed by id; custom fields
+# are just extra columns. A name -> [ids] hash index sits alongside so name
+# lookups don't scan the table.
+
+
+def ensure_id(entity: dict) -> dict:
+    if not entity.get("id"):
+        entity["id"] = str(uuid.uuid4())
+    return entity
+
+
+def _normalise_frame(df: pd.DataFrame) -> pd.DataFrame:
+    # all cells as strings, blank ids filled, one row per id
+    df = df.fillna("").astype(str)
+    for col in BASE_FIELDS:
+        if col not in df.columns:
+            df[col] = ""
+    blank = df["id"].str.strip() == ""
+    if blank.any():
+        df.loc[blank, "id"] = [str(uuid.uuid4()) for _ in range(int(blank.sum()))]
+    return df.drop_duplicates(subset="id", keep="first").set_index("id")
+
+
+class EntityStore:
+    def __init__(self, entities=None):
+        self._df = pd.DataFrame(columns=BASE_FIELDS).set_index("id")
+        self._ids_by_name = {}  # name -> list[id]
+        # both in revision order (an entry moves to the end when it changes), so
+        # changed_since / removed_since read only the tail
+        self._versions = {}     # id -> revision of its last change
+        self._removed = {}      # id -> revision it was deleted at, for incremental indexes
+        self._rev = 0
+        if entities is not None:
+            self.extend(entities)
+
+    def __len__(self):
+        return len(self._df)
+
+    def __iter__(self):
+        return iter(self.frame().to_dict("records"))
+
+    def __contains__(self, eid):
+        return eid in self._df.index
+
+    # ---- columns ----
+    @property
+    def custom_fields(self) -> list:
+        return [c for c in self._df.columns if c not in BASE_FIELDS]
+
+    def add_field(self, field: str) -> bool:
+        if not field or field in BASE_FIELDS or field in self._df.columns:
+            return False
+        self._df[field] = ""
+        self._rev += 1
+        return True
+
+    def drop_field(self, field: str):
+        if field in self.custom_fields:
+            self._df = self._df.drop(columns=field)
+            self._rev += 1
+
+    def _ensure_columns(self, columns):
+        for c in columns:
+            if c != "id" and c not in self._df.columns:
+                self._df[c] = ""
+
+    # ---- lookups ----
+    def frame(self) -> pd.DataFrame:
+        # id back as the first column, then base fields, then custom fields
+        return self._df.reset_index()[BASE_FIELDS + self.custom_fields]
+
+    def get(self, eid: str):
+        if eid not in self._df.index:
+            return None
+        e = self._df.loc[eid].to_dict()
+        e["id"] = eid
+        return e
+
+    def rows(self, ids) -> list:
+        # entity dicts for the given ids, in the order given; unknown ids are skipped
+        return self._df.loc[[eid for eid in ids if eid in self._versions]].reset_index().to_dict("records")
+
+    def name_by_id(self, eid: str) -> str:
+        if eid not in self._df.index:
+            return eid
+        return self._df.at[eid, "name"]
+
+    def ids_by_name(self, name: str) -> list:
+        return list(self._ids_by_name.get(name, []))
+
+    def id_by_name(self, name: str) -> str:
+        ids = self._ids_by_name.get(name)
+        return ids[0] if ids else ""
+
+    def ids(self) -> list:
+        return self._df.index.tolist()
+
+    def version(self, eid: str) -> int:
+        return self._versions.get(eid, 0)
+
+    @property
+    def revision(self) -> int:
+        # bumped by every mutation, including field add/remove
+        return self._rev
+
+    def _touch(self, eid):
+        self._rev += 1
+        self._versions.pop(eid, None)
+        self._versions[eid] = self._rev
+        self._removed.pop(eid, None)
+
+    @staticmethod
+    def _since(log: dict, rev: int) -> list:
+        tail = []
+        for eid in reversed(log):
+            if log[eid] <= rev:
+                break
+            tail.append(eid)
+        return tail[::-1]
+
+    def changed_since(self, rev: int) -> list:
+        # ids added or updated after revision `rev` (deletions are not listed)
+        return self._since(self._versions, rev)
+
+    def removed_since(self, rev: int) -> list:
+        return self._since(self._removed, rev)
+
+    def names(self) -> list:
+        return self._df["name"].tolist()
+
+    def column(self, field: str, ids=None) -> list:
+        if ids is None:
+            return self._df[field].tolist()
+        return self._df.loc[list(ids), field].tolist()
+
+    def duplicate_names(self) -> dict:
+        return {n: list(ids) for n, ids in self._ids_by_name.items() if len(ids) > 1}
+
+    def display_name(self, eid: str) -> str:
+        # disambiguate entities that share a name with a short id suffix
+        name = self.name_by_id(eid)
+        if len(self._ids_by_name.get(name, [])) > 1:
+            return f"{name} [{eid[:8]}]"
+        return name
+
+    def filter(self, types=None, text: str = "") -> list:
+        # ids matching any of `types` and containing `text` in any column
+        mask = pd.Series(True, index=self._df.index)
+        if types:
+            mask &= self._df["type"].isin(types)
+        if text:
+            hit = pd.Series(False, index=self._df.index)
+            for col in self._df.columns:
+                hit |= self._df[col].str.contains(text, case=False, regex=False)
+            mask &= hit | self._df.index.str.contains(text, case=False, regex=False)
+        return self._df.index[mask].tolist()
+
+    def match(self, text: str, limit: int = 20) -> list:
+        # ids whose name starts with / contains `text` (prefix hits first), for pickers
+        if not text:
+            return self._df.index[:limit].tolist()
+        names = self._df["name"].str.lower()
+        text = text.lower()
+        prefix = names.str.startswith(text)
+        ids = self._df.index[prefix][:limit].tolist()
+        if len(ids) < limit:
+            inner = names.str.contains(text, regex=False) & ~prefix
+            ids += self._df.index[inner][:limit - len(ids)].tolist()
+        return ids
+
+    # ---- index maintenance ----
+    def _index_name(self, name, eid):
+        self._ids_by_name.setdefault(name, []).append(eid)
+
+    def _unindex_name(self, name, eid):
+        ids = self._ids_by_name.get(name)
+        if not ids:
+            return
+        if eid in ids:
+            ids.remove(eid)
+        if not ids:
+            del self._ids_by_name[name]
+
+    # ---- mutations ----
+    def add(self, entity: dict) -> dict:
+        ensure_id(entity)
+        if entity["id"] in self._df.index:
+            raise ValueError(f"Duplicate entity id: {entity['id']}")
+        self.extend(pd.DataFrame([entity]))
+        return entity
+
+    def update(self, eid: str, changes: dict):
+        if eid not in self._df.index:
+            raise KeyError(eid)
+        self._ensure_columns(changes)
+        old_name = self._df.at[eid, "name"]
+        for k, v in changes.items():
+            if k != "id":
+                self._df.at[eid, k] = "" if v is None else str(v)
+        if "name" in changes and changes["name"] != old_name:
+            self._unindex_name(old_name, eid)
+            self._index_name(self._df.at[eid, "name"], eid)
+        self._touch(eid)
+        return self.get(eid)
+
+    def update_many(self, changes: dict) -> int:
+        # {id: {field: value}} from a bulk edit; unknown ids are skipped
+        updated = 0
+        for eid, fields in changes.items():
+            if eid in self._df.index:
+                self.update(eid, fields)
+                updated += 1
+        return updated
+
+    def remove(self, eid: str):
+        e = self.get(eid)
+        if e is not None:
+            self._df = self._df.drop(index=eid)
+            self._unindex_name(e.get("name", ""), eid)
+            self._versions.pop(eid, None)
+            self._rev += 1
+            self._removed[eid] = self._rev
+        return e
+
+    def remove_many(self, ids) -> list:
+        # one frame copy for the whole batch rather than one per id
+        ids = [eid for eid in dict.fromkeys(ids) if eid in self._df.index]
+        if not ids:
+            return []
+        removed = self.rows(ids)
+        self._df = self._df.drop(index=ids)
+        self._rev += 1
+        for e in removed:
+            self._unindex_name(e.get("name", ""), e["id"])
+            self._versions.pop(e["id"], None)
+            self._removed[e["id"]] = self._rev
+        return removed
+
+    def extend(self, entities) -> int:
+        # append a DataFrame or list of dicts, skipping ids that already exist;
+        # returns number added
+        df = entities if isinstance(entities, pd.DataFrame) else pd.DataFrame(list(entities))
+        if df.empty:
+            return 0
+        df = _normalise_frame(df)
+        df = df[self._df.index.get_indexer(df.index) < 0]
+        if df.empty:
+            return 0
+        self._ensure_columns(df.columns)
+        df = df.reindex(columns=self._df.columns, fill_value="")
+        self._df = df if self._df.empty else pd.concat([self._df, df])
+        for eid, name in zip(df.index, df["name"]):
+            self._index_name(name, eid)
+            self._touch(eid)
+        return len(df)
+
+    def replace_all(self, entities) -> int:
+        # drop all rows but keep the custom field columns
+        self._rev += 1
+        self._removed.update(dict.fromkeys(self._df.index, self._rev))
+        self._df = self._df.iloc[0:0]
+        self._ids_by_name.clear()
+        self._versions.clear()
+        return self.extend(entities)
+
+
+# --------------------------
+# Relationship Store
+# --------------------------
+# Relationships keyed by a stable id, with per-source and per-target
+# adjacency maps so "which edges touch X" costs O(degree of X).
+
+
+def ensure_rel_id(rel: dict) -> dict:
+    if not rel.get("id"):
+        rel["id"] = str(uuid.uuid4())
+    return rel
+
+
+class RelationshipStore:
+    def __init__(self, relationships=None):
+        self._by_id = {}  # rel id -> relationship dict (insertion ordered)
+        self._out = {}    # source_id -> {rel ids}
+        self._in = {}     # target_id -> {rel ids}
+        self._versions = {}  # rel id -> revision of its last change
+        self._rev = 0
+        for r in relationships or []:
+            self.add(r)
+
+    def __len__(self):
+        return len(self._by_id)
+
+    def __iter__(self):
+        return iter(list(self._by_id.values()))
+
+    def __contains__(self, rid):
+        return rid in self._by_id
+
+    def get(self, rid: str):
+        return self._by_id.get(rid)
+
+    def version(self, rid: str) -> int:
+        return self._versions.get(rid, 0)
+
+    @property
+    def revision(self) -> int:
+        return self._rev
+
+    def _touch(self, rid):
+        self._rev += 1
+        self._versions[rid] = self._rev
+
+    # ---- adjacency ----
+    def _link(self, r):
+        self._out.setdefault(r.get("source_id", ""), set()).add(r["id"])
+        self._in.setdefault(r.get("target_id", ""), set()).add(r["id"])
+
+    def _unlink(self, r):
+        for adj, key in ((self._out, r.get("source_id", "")), (self._in, r.get("target_id", ""))):
+            rids = adj.get(key)
+            if rids is None:
+                continue
+            rids.discard(r["id"])
+            if not rids:
+                del adj[key]
+
+    def edges_from(self, eid: str) -> list:
+        return [self._by_id[rid] for rid in self._out.get(eid, ())]
+
+    def edges_to(self, eid: str) -> list:
+        return [self._by_id[rid] for rid in self._in.get(eid, ())]
+
+    def edges_of(self, eid: str) -> list:
+        rids = self._out.get(eid, set()) | self._in.get(eid, set())
+        return [self._by_id[rid] for rid in rids]
+
+    def neighbours(self, eid: str) -> set:
+        out = {self._by_id[rid].get("target_id", "") for rid in self._out.get(eid, ())}
+        inc = {self._by_id[rid].get("source_id", "") for rid in self._in.get(eid, ())}
+        return (out | inc) - {eid}
+
+    def neighbourhood(self, seeds, hops: int) -> dict:
+        # breadth-first over edges in either direction: id -> hops from the
+        # nearest seed, for everything within `hops`; touches only those ids' edges
+        dist = {eid: 0 for eid in seeds}
+        frontier = list(dist)
+        for d in range(1, hops + 1):
+            nxt = []
+            for eid in frontier:
+                for n in self.neighbours(eid):
+                    if n not in dist:
+                        dist[n] = d
+                        nxt.append(n)
+            if not nxt:
+                break
+            frontier = nxt
+        return dist
+
+    def components(self, ids) -> list:
+        # connected components of `ids` (edges in either direction, only between
+        # members of `ids`), largest first
+        remaining = set(ids)
+        comps = []
+        for start in ids:
+            if start not in remaining:
+                continue
+            remaining.discard(start)
+            comp, stack = [start], [start]
+            while stack:
+                for n in self.neighbours(stack.pop()):
+                    if n in remaining:
+                        remaining.discard(n)
+                        comp.append(n)
+                        stack.append(n)
+            comps.append(comp)
+        comps.sort(key=len, reverse=True)
+        return comps
+
+    def degree(self, eid: str) -> int:
+        return len(self._out.get(eid, ())) + len(self._in.get(eid, ()))
+
+    # ---- mutations ----
+    def add(self, rel: dict) -> dict:
+        ensure_rel_id(rel)
+        if rel["id"] in self._by_id:
+            raise ValueError(f"Duplicate relationship id: {rel['id']}")
+        self._by_id[rel["id"]] = rel
+        self._link(rel)
+        self._touch(rel["id"])
+        return rel
+
+    def update(self, rid: str, changes: dict) -> dict:
+        r = self._by_id[rid]
+        self._unlink(r)
+        r.update(changes)
+        self._link(r)
+        self._touch(rid)
+        return r
+
+    def remove(self, rid: str):
+        r = self._by_id.pop(rid, None)
+        if r is not None:
+            self._unlink(r)
+            self._versions.pop(rid, None)
+            self._rev += 1
+        return r
+
+    def remove_entity(self, eid: str) -> list:
+        # cascade for an entity delete; touches only the entity's own edges
+        removed = self.edges_of(eid)
+        for r in removed:
+            self.remove(r["id"])
+        return removed
+
+    def extend(self, relationships) -> int:
+        added = 0
+        for r in relationships:
+            ensure_rel_id(r)
+            if r["id"] not in self._by_id:
+                self.add(r)
+                added += 1
+        return added
+
+    def replace_all(self, relationships) -> int:
+        self._by_id.clear()
+        self._out.clear()
+        self._in.clear()
+        self._versions.clear()
+        self._rev += 1
+        return self.extend(relationships)
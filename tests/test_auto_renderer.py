@@ -0,0 +1,70 @@
+# AutoRenderer backend ordering and fall-through.
+#   python -m pytest tests
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from renderers import AutoRenderer, BackendUnavailable, RenderError
+
+
+class Backend:
+    def __init__(self, name, fail=False):
+        self.name = name
+        self.fail = fail
+
+    def available(self):
+        return True
+
+    def render(self, dot_source, fmt):
+        if self.fail:
+            raise BackendUnavailable(f"{self.name} down")
+        return self.name.encode()
+
+
+def test_unmeasured_backends_keep_their_place_after_measured_ones():
+    warm, local, remote = Backend("warm"), Backend("local"), Backend("remote")
+    auto = AutoRenderer([warm, local, remote])
+    assert [b.name for b in auto.order()] == ["warm", "local", "remote"]
+    auto._record("warm", 0.5)
+    assert [b.name for b in auto.order()] == ["warm", "local", "remote"]
+    auto._record("remote", 0.1)
+    assert [b.name for b in auto.order()] == ["remote", "warm", "local"]
+
+
+def test_failing_backend_falls_through_and_cools_down():
+    auto = AutoRenderer([Backend("warm", fail=True), Backend("local")])
+    assert auto.render("digraph {}", "svg") == b"local"
+    assert [b.name for b in auto.order()] == ["local", "warm"]
+
+
+def test_formats_a_backend_lacks_skip_it_without_a_cooldown():
+    remote = Backend("remote")
+    remote.formats = ("png", "pdf", "svg")
+    auto = AutoRenderer([remote])
+    with pytest.raises(RenderError, match="produces dot"):
+        auto.render("digraph {}", "dot")
+    assert auto.stats()["remote"]["cooling_down"] is False
+    assert auto.render("digraph {}", "svg") == b"remote"
+
+
+def test_bad_dot_is_not_retried_elsewhere():
+    calls = []
+
+    class Strict(Backend):
+        def render(self, dot_source, fmt):
+            calls.append(self.name)
+            raise RenderError("syntax error in line 1")
+    auto = AutoRenderer([Strict("warm"), Strict("local")])
+    with pytest.raises(RenderError, match="syntax error"):
+        auto.render("digraph {", "svg")
+    assert calls == ["warm"]
+    assert not any(s["cooling_down"] for s in auto.stats().values())
+
+
+def test_every_backend_down_is_unavailable():
+    auto = AutoRenderer([Backend("warm", fail=True), Backend("local", fail=True)])
+    with pytest.raises(BackendUnavailable, match="warm: warm down; local: local down"):
+        auto.render("digraph {}", "svg")
@@ -0,0 +1,40 @@
+# render_by_component routing, with a stand-in render and gvpack.
+#   python -m pytest tests
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from component_layout import render_by_component
+
+WHOLE = "digraph G {\n\ta\n\tb\n}\n"
+PARTS = ["digraph A {\n\ta\n}\n", "digraph B {\n\tb\n}\n"]
+
+
+def fake_gvpack(tmp_path):
+    # concatenates its input, standing in for the packed graph
+    path = tmp_path / "gvpack"
+    path.write_text(f"#!{sys.executable}\nimport sys\nsys.stdout.write('packed ' + sys.stdin.read())\n")
+    path.chmod(0o755)
+    return str(path)
+
+
+def recorder(calls):
+    def render(dot_source, fmt):
+        calls.append((fmt, dot_source))
+        return dot_source.encode("utf-8")
+    return render
+
+
+def test_pdf_is_packed_and_drawn_as_one_vector_page(tmp_path):
+    calls = []
+    render_by_component(PARTS, "pdf", recorder(calls), WHOLE, gvpack=fake_gvpack(tmp_path))
+    assert [fmt for fmt, _ in calls] == ["dot", "dot", "pdf"]
+    assert calls[-1][1].startswith("packed ") and 'layout="nop2"' in calls[-1][1]
+
+
+def test_without_gvpack_the_whole_graph_is_rendered(tmp_path, monkeypatch):
+    monkeypatch.setattr("shutil.which", lambda name: None)
+    calls = []
+    render_by_component(PARTS, "pdf", recorder(calls), WHOLE)
+    assert calls == [("pdf", WHOLE)]
@@ -0,0 +1,86 @@
+# Entity and relationship CSV checks.
+#   python -m pytest tests
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from csv_import import name_ids, resolve_relationships, validate_entities
+
+ENTITY_TYPES = ["Individual", "Company", "Trust", "SMSF", "Other"]
+
+
+def test_name_ids_survive_appending_the_file_again():
+    first = name_ids(["Alice", "Bob"], {})
+    again = name_ids(["Zed", "Alice", "Bob"], {})
+    assert again[1:] == first  # the store skips them as already present
+
+
+def test_name_ids_keep_namesakes_apart_across_chunks():
+    seen = {}
+    ids = name_ids(["Jo Lee", "Sam"], seen) + name_ids(["Jo Lee"], seen)
+    assert len(set(ids)) == 3
+    assert name_ids(["Jo Lee", "Jo Lee"], {}) == [ids[0], ids[2]]
+
+
+def chunk(rows, columns, start=0):
+    # a read_chunks() chunk: text only, index continuing across chunks
+    return pd.DataFrame(rows, columns=columns, index=range(start, start + len(rows)), dtype=str)
+
+
+def test_validate_entities_drops_and_reports():
+    df = chunk([["a", "Alice", "Individual"], ["b", "", "Company"], ["c", "Acme", "Corp"],
+                ["a", "Alice again", "Individual"], ["x", "Xavier", "Trust"]], ["id", "name", "type"])
+    ok, issues = validate_entities(df, ENTITY_TYPES, existing=["x"])
+    assert ok["id"].tolist() == ["a", "c"]
+    assert ok.set_index("id").at["c", "type"] == "Other"
+    assert issues.values.tolist() == [
+        [3, "name", "", "missing"],
+        [4, "type", "Corp", "unknown type, set to Other"],
+        [5, "id", "a", "duplicate id, row skipped"],
+        [6, "id", "x", "duplicate id, row skipped"],
+    ]
+
+
+def test_validate_entities_rows_count_from_the_chunk_start():
+    df = chunk([["Bo", "Company"], ["", "Trust"]], ["name", "type"], start=50_000)
+    ok, issues = validate_entities(df, ENTITY_TYPES)
+    assert issues["row"].tolist() == [50_003]
+    assert ok["type"].tolist() == ["Company"]
+
+
+def test_validate_entities_defaults_type_and_needs_a_name():
+    ok, _ = validate_entities(chunk([["Ann"]], ["name"]), ENTITY_TYPES)
+    assert ok["type"].tolist() == ["Other"]
+    with pytest.raises(ValueError, match="name"):
+        validate_entities(chunk([["Ann"]], ["full_name"]), ENTITY_TYPES)
+
+
+ENTITIES = pd.DataFrame({"id": ["a", "b", "c1", "c2"], "name": ["Alice", "Bob", "Chris", "Chris"]})
+
+
+def test_resolve_relationships_by_name():
+    df = chunk([["Alice", "Bob", "owns"], ["Alice", "Chris", "director"], ["Zed", "Bob", ""],
+                ["", "Alice", "x"]], ["from", "to", "label"])
+    rels, issues = resolve_relationships(df, ENTITIES)
+    assert rels.values.tolist() == [["a", "b", "owns"]]
+    assert issues.values.tolist() == [
+        [3, "to", "Chris", "ambiguous (2 entities share this name)"],
+        [4, "from", "Zed", "unresolved"],
+        [5, "from", "", "missing"],
+    ]
+
+
+def test_resolve_relationships_by_id_and_mixed():
+    df = chunk([["a", "Bob"], ["nope", "Alice"]], ["source_id", "to"])
+    rels, issues = resolve_relationships(df, ENTITIES)
+    assert rels.values.tolist() == [["a", "b", ""]]
+    assert issues.values.tolist() == [[3, "source_id", "nope", "unknown id"]]
+
+
+def test_resolve_relationships_needs_both_ends():
+    with pytest.raises(ValueError, match="target_id' or 'to'"):
+        resolve_relationships(chunk([["Alice"]], ["from"]), ENTITIES)
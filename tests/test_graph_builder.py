@@ -0,0 +1,64 @@
+# Level of detail across per-component graphs.
+#   python -m pytest tests
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from graph_builder import build_graph, component_graphs, fold_plan
+from incremental_layout import node_names
+from structure_store import EntityStore, RelationshipStore
+
+
+def chains(groups: int, size: int):
+    # `groups` unrelated chains of `size` companies
+    ents, rels = [], []
+    for g in range(groups):
+        ids = [f"g{g}e{i}" for i in range(size)]
+        ents += [dict(id=eid, name=eid, type="Company") for eid in ids]
+        rels += [dict(source_id=a, target_id=b, label="owns") for a, b in zip(ids, ids[1:])]
+    return EntityStore(ents), RelationshipStore(rels)
+
+
+def test_budget_holds_across_component_graphs():
+    store, rels = chains(8, 30)
+    lod = (100, [])
+    parts = component_graphs(store, rels, "T", "LR", lod=lod)
+    assert len(parts) == 8
+    names = [n for g in parts for n in node_names(g.source)]
+    assert len(names) <= 100
+    assert len(set(names)) == len(names)  # per-part summaries are named apart
+
+
+def families(count: int):
+    # `count` unrelated families: one person owning four entities of other types
+    types = ["Individual", "Company", "Trust", "SMSF", "Other"]
+    ents, rels = [], []
+    for f in range(count):
+        ids = [f"f{f}e{i}" for i in range(5)]
+        ents += [dict(id=eid, name=eid, type=typ) for eid, typ in zip(ids, types)]
+        rels += [dict(source_id=ids[0], target_id=eid, label="owns") for eid in ids[1:]]
+    return EntityStore(ents), RelationshipStore(rels)
+
+
+def test_budget_holds_with_many_components():
+    # too many parts for a summary node each: they share them and lay out together
+    store, rels = families(3000)
+    plan = fold_plan(store, rels, lod=(500, []), split=True)
+    parts = component_graphs(store, rels, "T", "LR", folded=plan)
+    names = [n for g in parts for n in node_names(g.source)]
+    assert len(names) <= 500
+    assert len(store) - len(plan) >= 490  # not everything folded away
+    assert sum(n.startswith("lod|") for n in names) == 5
+
+
+def test_components_fold_what_the_whole_graph_reports():
+    store, rels = chains(8, 30)
+    lod = (100, [])
+    plan = fold_plan(store, rels, lod=lod, split=True)
+    collapsed = {}
+    build_graph(store, rels, "T", "LR", lod=lod, collapsed=collapsed, folded=plan)
+    shown = {n for g in component_graphs(store, rels, "T", "LR", folded=plan) for n in node_names(g.source)}
+    assert sum(collapsed.values()) == len(plan)
+    assert not shown & set(plan)
+    assert len(shown - {n for n in shown if n.startswith("lod|")}) == len(store) - len(plan)
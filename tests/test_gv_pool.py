@@ -0,0 +1,43 @@
+# Graphviz worker start-up failures.
+#   python -m pytest tests
+import os
+import subprocess
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import gv_pool
+from gv_pool import GraphvizWorkerPool, WorkerUnavailable
+
+
+@pytest.fixture
+def spawned(monkeypatch):
+    # every worker process started during the test
+    procs = []
+
+    class Recorded(subprocess.Popen):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            procs.append(self)
+    monkeypatch.setattr(gv_pool.subprocess, "Popen", Recorded)
+    return procs
+
+
+def test_start_timeout_kills_the_worker(spawned):
+    with pytest.raises(WorkerUnavailable, match="timed out"):
+        gv_pool._Worker(start_timeout=0)
+    assert spawned and all(p.returncode is not None and p.stdout.closed for p in spawned)
+
+
+def test_start_failure_is_unavailable_not_a_dot_error(spawned, monkeypatch):
+    # the worker replies "E" at start-up (here: a stand-in for a missing libgvc)
+    script = "import sys, struct; sys.stdout.buffer.write(b'E' + struct.pack('>I', 6) + b'no gvc')"
+    popen = gv_pool.subprocess.Popen
+    monkeypatch.setattr(gv_pool.subprocess, "Popen", lambda cmd, **kw: popen([sys.executable, "-c", script], **kw))
+    pool = GraphvizWorkerPool(size=1)
+    pool._available = True  # as if start-up had worked and the worker since retired
+    with pytest.raises(WorkerUnavailable, match="no gvc"):
+        pool.render("digraph { a }", "svg")
+    assert all(p.returncode is not None for p in spawned)
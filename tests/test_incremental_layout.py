@@ -0,0 +1,60 @@
+# render_with_positions on backends without positioned output.
+#   python -m pytest tests
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from incremental_layout import render_with_positions
+from renderers import RenderError
+
+DOT = 'digraph G {\n\t"a" [label=a]\n\t"b" [label=b]\n\ta -> b\n}\n'
+
+
+def images_only(calls):
+    # like the remote /render service: png / pdf / svg only
+    def render(dot_source, fmt):
+        calls.append(fmt)
+        if fmt not in ("png", "pdf", "svg"):
+            raise RenderError("HTTP 400 - format must be one of png, pdf, svg")
+        return b"<svg/>"
+    return render
+
+
+def test_falls_back_to_a_plain_render():
+    calls = []
+    data, positions, mode = render_with_positions(DOT, "svg", images_only(calls))
+    assert (data, positions, mode) == (b"<svg/>", None, "full")
+    assert calls == ["dot", "svg"]
+
+
+def test_falls_back_from_an_incremental_layout():
+    calls = []
+    known = {"a": "27,18", "b": "27,90"}
+    data, positions, mode = render_with_positions(DOT, "svg", images_only(calls), positions=known)
+    assert (positions, mode) == (None, "full")
+
+
+def test_bad_dot_still_raises():
+    def render(dot_source, fmt):
+        raise RenderError("syntax error")
+    with pytest.raises(RenderError, match="syntax error"):
+        render_with_positions("digraph {", "svg", render)
+
+
+def test_dropping_most_nodes_is_a_full_layout():
+    # e.g. focusing on two entities of a laid-out structure of thirty
+    calls = []
+
+    def render(dot_source, fmt):
+        calls.append((fmt, '!"]' in dot_source))  # pinned positions
+        if fmt == "json":
+            return b'{"objects": [{"name": "a", "pos": "0,0"}, {"name": "b", "pos": "0,72"}]}'
+        return dot_source.encode("utf-8")
+    known = {n: f"{i},0" for i, n in enumerate(["a", "b"] + [f"x{i}" for i in range(28)])}
+    data, positions, mode = render_with_positions(DOT, "svg", render, positions=known)
+    assert mode == "full"
+    assert calls[0] == ("dot", False)  # laid out from scratch, nothing pinned
+    assert positions == {"a": "0,0", "b": "0,72"}
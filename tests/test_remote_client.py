@@ -0,0 +1,115 @@
+# RemoteRenderClient against a local stand-in /render server.
+#   python -m pytest tests
+import gzip
+import json
+import os
+import socket
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from renderers import RemoteRenderClient, RenderError
+
+DOT = "digraph G { a -> b }"
+
+
+class StandIn(ThreadingHTTPServer):
+    # answers POST /render from a script of responses; `reply(request)` returns
+    # (status, body) and every request is kept as (headers, decoded JSON)
+    daemon_threads = True
+
+    def __init__(self, reply):
+        super().__init__(("127.0.0.1", 0), StandInHandler)
+        self.reply = reply
+        self.requests = []
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        gzipped = self.headers.get("Content-Encoding") == "gzip"
+        request = dict(gzip=gzipped, body=json.loads(gzip.decompress(body) if gzipped else body))
+        self.server.requests.append(request)
+        status, data = self.server.reply(request)
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+@pytest.fixture
+def serve():
+    servers = []
+
+    def start(reply):
+        srv = StandIn(reply)
+        threading.Thread(target=srv.serve_forever, daemon=True).start()
+        servers.append(srv)
+        return srv
+    yield start
+    for srv in servers:
+        srv.shutdown()
+        srv.server_close()
+
+
+def scripted(*statuses):
+    # replies with the given statuses in turn, then 200 for the rest
+    it = iter(statuses)
+    return lambda request: (next(it, 200), b"<svg/>")
+
+
+def test_retries_503_then_succeeds(serve):
+    srv = serve(scripted(503, 503))
+    client = RemoteRenderClient(srv.url, retries=3, backoff=0)
+    assert client.render(DOT, "svg") == b"<svg/>"
+    assert len(srv.requests) == 3
+    assert srv.requests[-1]["body"] == {"dot": DOT, "format": "svg"}
+
+
+def test_retries_exhausted_raises(serve):
+    srv = serve(lambda request: (503, b"busy"))
+    client = RemoteRenderClient(srv.url, retries=2, backoff=0)
+    with pytest.raises(RenderError, match="503"):
+        client.render(DOT, "svg")
+    assert len(srv.requests) == 3  # first try + 2 retries
+
+
+def test_large_body_is_gzipped(serve):
+    srv = serve(scripted())
+    client = RemoteRenderClient(srv.url, backoff=0, gzip_min_bytes=1024)
+    big = "digraph G {" + " a -> b;" * 500 + " }"
+    client.render(DOT, "svg")
+    client.render(big, "svg")
+    assert [r["gzip"] for r in srv.requests] == [False, True]
+    assert srv.requests[1]["body"]["dot"] == big
+
+
+def test_415_falls_back_to_plain_and_remembers(serve):
+    srv = serve(lambda request: (415, b"no gzip") if request["gzip"] else (200, b"<svg/>"))
+    client = RemoteRenderClient(srv.url, backoff=0, gzip_min_bytes=0)
+    assert client.render(DOT, "svg") == b"<svg/>"
+    assert client.gzip_ok is False
+    client.render(DOT, "png")
+    assert [r["gzip"] for r in srv.requests] == [True, False, False]
+
+
+def test_connection_refused_raises():
+    with socket.socket() as s:  # a port nothing listens on
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    client = RemoteRenderClient(f"http://127.0.0.1:{port}", retries=1, backoff=0, connect_timeout=1)
+    with pytest.raises(RenderError, match="Remote render error"):
+        client.render(DOT, "svg")
@@ -0,0 +1,100 @@
+# RenderCache tiers and single-flight rendering.
+#   python -m pytest tests
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from render_cache import RenderCache, render_key
+
+
+def test_memory_tier_evicts_least_recently_used_by_bytes():
+    cache = RenderCache(max_bytes=10)
+    cache.put("a", b"aaaa")
+    cache.put("b", b"bbbb")
+    assert cache.get("a") == b"aaaa"  # now b is the oldest
+    cache.put("c", b"cccc")
+    assert cache.get("b") is None
+    assert cache.get("a") == b"aaaa" and cache.get("c") == b"cccc"
+    assert cache.stats["evictions"] == 1
+
+
+def test_oversized_results_are_not_kept_in_memory():
+    cache = RenderCache(max_bytes=4)
+    cache.put("small", b"abc")
+    cache.put("big", b"too large")
+    assert cache.get("big") is None
+    assert cache.get("small") == b"abc"
+
+
+def test_disk_tier_survives_a_new_cache(tmp_path):
+    RenderCache(disk_dir=str(tmp_path)).put("k", b"svg")
+    cache = RenderCache(disk_dir=str(tmp_path))
+    assert cache.get("k") == b"svg"
+    assert cache.stats["disk_hits"] == 1
+    assert cache.get("k") == b"svg"  # promoted to memory
+    assert cache.stats["hits"] == 1
+
+
+def test_disk_tier_trims_least_recently_used(tmp_path):
+    cache = RenderCache(disk_dir=str(tmp_path), disk_max_bytes=10)
+    cache.put("old", b"1234")
+    os.utime(tmp_path / "old", (time.time() - 60, time.time() - 60))
+    cache.put("mid", b"1234")
+    cache.put("new", b"1234")
+    assert sorted(os.listdir(tmp_path)) == ["mid", "new"]
+
+
+def test_concurrent_renders_of_one_key_share_a_call():
+    cache = RenderCache()
+    release = threading.Event()
+    calls = []
+
+    def render():
+        calls.append(1)
+        release.wait(5)
+        return b"png"
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_render("digraph {}", "png", "dot", render)))
+               for _ in range(4)]
+    for t in threads:
+        t.start()
+    while cache.stats["joined"] < 3:
+        time.sleep(0.01)
+    release.set()
+    for t in threads:
+        t.join(5)
+    assert results == [b"png"] * 4
+    assert len(calls) == 1
+    assert cache.get(render_key("digraph {}", "png")) == b"png"
+
+
+def test_errors_reach_every_waiter_and_are_not_cached():
+    cache = RenderCache()
+    release = threading.Event()
+
+    def fail():
+        release.wait(5)
+        raise RuntimeError("layout failed")
+    errors = []
+
+    def call():
+        try:
+            cache.get_or_render("digraph {}", "svg", "dot", fail)
+        except RuntimeError as e:
+            errors.append(str(e))
+    threads = [threading.Thread(target=call) for _ in range(2)]
+    for t in threads:
+        t.start()
+    while cache.stats["joined"] < 1:
+        time.sleep(0.01)
+    release.set()
+    for t in threads:
+        t.join(5)
+    assert errors == ["layout failed"] * 2
+    assert cache.get_or_render("digraph {}", "svg", "dot", lambda: b"svg") == b"svg"
+    assert cache.stats["misses"] == 2
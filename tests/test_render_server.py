@@ -0,0 +1,79 @@
+# render_server status codes, with a stand-in renderer in place of Graphviz.
+#   python -m pytest tests
+import http.client
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import render_server
+from render_server import RenderServer
+from renderers import BackendUnavailable, RenderError
+
+
+class StandInRenderer:
+    # raises `error` if set, otherwise renders everything to b"<svg/>"
+    error = None
+
+    def available(self):
+        return True
+
+    def render(self, dot_source, fmt):
+        if self.error:
+            raise self.error
+        return b"<svg/>"
+
+
+@pytest.fixture
+def server():
+    srv = RenderServer(("127.0.0.1", 0), workers=1, retry_after=7)
+    srv.renderer = StandInRenderer()
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    yield srv
+    srv.shutdown()
+    srv.server_close()
+
+
+def post(srv, body: bytes, headers=None):
+    conn = http.client.HTTPConnection("127.0.0.1", srv.server_address[1], timeout=5)
+    conn.putrequest("POST", "/render")
+    for k, v in (headers or {"Content-Length": str(len(body))}).items():
+        conn.putheader(k, v)
+    conn.endheaders(body)
+    resp = conn.getresponse()
+    resp.read()
+    conn.close()
+    return resp
+
+
+def test_renders(server):
+    resp = post(server, b'{"dot": "digraph { a }", "format": "svg"}')
+    assert resp.status == 200
+
+
+def test_bad_dot_is_422(server):
+    server.renderer.error = RenderError("syntax error in line 1")
+    assert post(server, b'{"dot": "digraph {", "format": "svg"}').status == 422
+
+
+def test_backend_failure_is_503_with_retry_after(server):
+    server.renderer.error = BackendUnavailable("Graphviz worker died")
+    resp = post(server, b'{"dot": "digraph { b }", "format": "svg"}')
+    assert resp.status == 503
+    assert resp.getheader("Retry-After") == "7"
+
+
+def test_non_numeric_content_length_is_400_and_closes(server):
+    resp = post(server, b"{}", {"Content-Length": "lots"})
+    assert resp.status == 400
+    assert resp.getheader("Connection") == "close"
+
+
+def test_oversized_body_is_413_and_closes(server, monkeypatch):
+    monkeypatch.setattr(render_server, "MAX_BODY_BYTES", 16)
+    resp = post(server, b'{"dot": "digraph { a -> b -> c }", "format": "svg"}')
+    assert resp.status == 413
+    assert resp.getheader("Connection") == "close"
@@ -0,0 +1,55 @@
+# EntityStore removal tracking, as read by the incremental search index.
+#   python -m pytest tests
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from search_index import SearchIndex
+from structure_store import EntityStore
+
+
+def person(eid, name):
+    return dict(id=eid, name=name, type="Individual")
+
+
+def test_replace_all_keeps_earlier_removals():
+    store = EntityStore([person("a", "Alice Smith"), person("b", "Bob Jones")])
+    index = SearchIndex()
+    index.sync(store)
+    store.remove("a")  # not yet seen by the index
+    store.replace_all([person("b", "Bob Jones"), person("c", "Carol White")])
+    index.sync(store)
+    assert index.search("Alice") == []
+    assert sorted(store.removed_since(0)) == ["a"]
+
+
+def test_rows_skips_unknown_ids():
+    store = EntityStore([person("a", "Alice Smith")])
+    assert [e["id"] for e in store.rows(["gone", "a"])] == ["a"]
+
+
+def test_changed_since_lists_changes_in_revision_order():
+    store = EntityStore([person("a", "Alice Smith"), person("b", "Bob Jones"), person("c", "Carol White")])
+    rev = store.revision
+    store.update("a", {"name": "Alice Brown"})
+    store.remove("b")
+    store.add(person("d", "Dan Green"))
+    assert store.changed_since(rev) == ["a", "d"]
+    assert store.removed_since(rev) == ["b"]
+    assert store.changed_since(store.revision) == []
+
+
+def test_new_custom_field_does_not_rebuild_the_index():
+    store = EntityStore([person("a", "Alice Smith")])
+    index = SearchIndex()
+    index.sync(store)
+    store.add_field("Notes")
+    assert index.sync(store) == 0
+    store.update("a", {"Notes": "harbour view"})
+    index.sync(store)
+    assert index.search("harbour") == ["a"]
+    store.drop_field("Notes")
+    index.sync(store)
+    assert index.search("harbour") == []
+    assert index.search("alice") == ["a"]